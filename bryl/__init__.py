@@ -53,21 +53,43 @@ __all__ = [
     'Datetime',
     'Time',
     'Record',
+    'CompactRecord',
+    'LazyRecord',
     'Reader',
+    'Dispatch',
+    'Writer',
+    'Predicate',
+    'Index',
+    'Stats',
+    'Layout',
+    'probe_many',
+    'dump_batch',
+    'load_batch',
 ]
 
 __version__ = '0.1.0'
 
+import array
 import collections
 import copy
+import cStringIO
 import datetime
 import inspect
 import itertools
+import mmap
+import multiprocessing
 import os
 import re
 import string
-import StringIO
+import struct
+import sys
 import threading
+import timeit
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class Context(threading.local):
@@ -100,22 +122,37 @@ class Context(threading.local):
             alpha_upper=False,
             **defaults
         )]
+        self.version = 0
+        self._flatten()
 
     def push(self, **kwargs):
         self.stack.append(self._Frame(**kwargs))
+        self._flatten()
         return self._Close(self.pop)
 
     def pop(self):
         self.stack.pop()
+        self._flatten()
 
     def __call__(self, **kwargs):
         self.stack[-1].update(kwargs)
+        self._flatten()
         return self
 
+    def _flatten(self):
+        # snapshot of the settings in effect, fetch it once rather than
+        # looking up settings one by one, and bump version so that anything
+        # derived from it can tell when it's stale
+        effective = self._Frame()
+        for frame in self.stack:
+            effective.update(frame)
+        self.effective = effective
+        self.version += 1
+
     def __getattr__(self, key):
-        for frame in reversed(self.stack):
-            if key in frame:
-                return frame[key]
+        effective = self.__dict__.get('effective')
+        if effective is not None and key in effective:
+            return effective[key]
         raise AttributeError(
             '"{0}" object has no attribute "{1}"'
             .format(type(self).__name__, key)
@@ -125,6 +162,313 @@ class Context(threading.local):
 ctx = Context(sanitize=True)
 
 
+class Cache(object):
+    """
+    Bounded least-recently-used cache with hit/miss statistics.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        # key -> [prev, next, key, value] circular list w/ root as sentinel
+        self.links = {}
+        self.root = []
+        self.root[:] = [self.root, self.root, None, None]
+
+    def get(self, key, default=None):
+        with self.lock:
+            link = self.links.get(key)
+            if link is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            prev, next, _, value = link
+            prev[1], next[0] = next, prev
+            root = self.root
+            last = root[0]
+            last[1] = root[0] = link
+            link[0], link[1] = last, root
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            if key in self.links:
+                self.links[key][3] = value
+                return
+            root = self.root
+            if len(self.links) >= self.size:
+                oldest = root[1]
+                root[1], oldest[1][0] = oldest[1], root
+                del self.links[oldest[2]]
+            last = root[0]
+            link = [last, root, key, value]
+            last[1] = root[0] = self.links[key] = link
+
+    def __len__(self):
+        return len(self.links)
+
+    def __repr__(self):
+        return '{0}(size={1}, hits={2}, misses={3}, len={4})'.format(
+            type(self).__name__, self.size, self.hits, self.misses, len(self),
+        )
+
+
+class Stats(object):
+    """
+    Call counts, timings and error counts for instrumented record types and
+    readers, e.g.:
+
+    .. code:: python
+
+        stats = bryl.Stats()
+        reader = MyLineReader(open('/my/records', 'rb'))
+        with stats.instrument(MyRecord, MyOtherRecord, reader):
+            for record in reader:
+                ...
+        print stats.as_dict()
+
+    Instrumenting wraps methods, and those of copies of record type fields,
+    in timers and un-instrumenting restores them, so this costs nothing when
+    not in use. Timers are keyed by:
+
+    - "{record}.load" and "{record}.dump" for records,
+    - "{record}.{field}.unpack", which includes "load" and "validate", and
+      "{record}.{field}.pack" for fields and
+    - "{reader}.read", "{reader}.as_record_type" and "{reader}.malformed" for
+      readers.
+
+    Note that instrumentation is not thread-safe and is not carried over to
+    `Reader.parallel` workers.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        #: Key -> [number of calls, seconds, number of errors].
+        self.timers = {}
+        #: Number of bytes of data read by instrumented readers.
+        self.bytes_read = 0
+
+    def instrument(self, *targets):
+        """
+        Instruments `targets`, record types or `Reader`s, until the returned
+        context manager exits or `restore` is called.
+        """
+        restores = []
+        for target in targets:
+            if isinstance(target, Reader):
+                restores.extend(self._instrument_reader(target))
+            else:
+                restores.extend(self._instrument_record_type(target))
+
+        def restore():
+            for obj, name, value in reversed(restores):
+                if value is _missing:
+                    delattr(obj, name)
+                else:
+                    setattr(obj, name, value)
+            del restores[:]
+
+        return Context._Close(restore)
+
+    def as_dict(self):
+        """
+        Flattened "{key}.calls", "{key}.seconds", "{key}.errors" and
+        "bytes_read" metrics.
+        """
+        metrics = {'bytes_read': self.bytes_read}
+        for key, (calls, seconds, errors) in self.timers.iteritems():
+            metrics[key + '.calls'] = calls
+            metrics[key + '.seconds'] = seconds
+            metrics[key + '.errors'] = errors
+        return metrics
+
+    def _instrument_record_type(self, record_type):
+        name = record_type.__name__
+        restores = []
+        # wrap copies of fields, which may be shared w/ other record types,
+        # and re-plan w/ those
+        fields = []
+        for field in record_type.fields:
+            restores.append((
+                record_type,
+                field.name,
+                record_type.__dict__.get(field.name, _missing),
+            ))
+            field = copy.copy(field)
+            setattr(record_type, field.name, field)
+            fields.append(field)
+        for attr in ['fields', 'layout', '_unpack_plan', '_pack_plan']:
+            restores.append(
+                (record_type, attr, record_type.__dict__.get(attr, _missing))
+            )
+        record_type.fields = fields
+        record_type.layout = record_type.layout._replace(fields=tuple(fields))
+        for field in fields:
+            key = '{0}.{1}'.format(name, field.name)
+            for attr in ['_unpack', 'load', 'pack']:
+                restores.append(self._wrap(
+                    field, attr, '{0}.{1}'.format(key, attr.lstrip('_'))
+                ))
+            restores.append(self._wrap(
+                field, 'validate', key + '.validate', self._count_error,
+            ))
+        record_type._plan()
+        restores.append((
+            record_type, 'load', record_type.__dict__.get('load', _missing)
+        ))
+        record_type.load = classmethod(
+            self._timed(record_type.load.im_func, name + '.load')
+        )
+        restores.append(self._wrap(record_type, 'dump', name + '.dump'))
+        return restores
+
+    def _instrument_reader(self, reader):
+        name = type(reader).__name__
+        restores = []
+        for attr in ['next_line', 'next_block']:
+            if hasattr(reader, attr):
+                restores.append(self._wrap(
+                    reader, attr, name + '.read', self._count_bytes,
+                ))
+        if reader.dispatch is None:
+            restores.append(self._wrap(
+                reader, 'as_record_type', name + '.as_record_type',
+            ))
+        restores.append(self._wrap(reader, 'malformed', name + '.malformed'))
+        # so that the reader can drop the wrappers when pickled
+        restores.insert(0, (
+            reader, '_instrumented', vars(reader).get('_instrumented', _missing)
+        ))
+        instrumented = dict(vars(reader).get('_instrumented', {}))
+        for obj, attr, value in restores[1:]:
+            instrumented.setdefault(attr, value)
+        reader._instrumented = instrumented
+        return restores
+
+    def _wrap(self, obj, attr, key, check=None):
+        # (obj, attr, value) with which to restore `obj.attr`
+        restore = obj, attr, vars(obj).get(attr, _missing)
+        setattr(obj, attr, self._timed(getattr(obj, attr), key, check))
+        return restore
+
+    def _timed(self, func, key, check=None):
+        timer = self.timers.setdefault(key, [0, 0.0, 0])
+        clock = timeit.default_timer
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                timer[2] += 1
+                raise
+            finally:
+                timer[0] += 1
+                timer[1] += clock() - start
+            if check is not None:
+                check(timer, result)
+            return result
+
+        return timed
+
+    @staticmethod
+    def _count_error(timer, error):
+        if error:
+            timer[2] += 1
+
+    def _count_bytes(self, timer, result):
+        data, _ = result
+        if data is not None:
+            self.bytes_read += len(data)
+
+
+class Predicate(object):
+    """
+    Predicate evaluated directly against a raw, i.e. not loaded, record. These
+    are built from fields, e.g.:
+
+    .. code:: python
+
+        MyRecord.code.eq('27') & ~MyRecord.trace.startswith('0712')
+
+    and are used to filter records before they are loaded.
+    """
+
+    def __call__(self, data):
+        raise NotImplementedError
+
+    def __and__(self, other):
+        return _All([self, other])
+
+    def __or__(self, other):
+        return _Any([self, other])
+
+    def __invert__(self):
+        return _Not(self)
+
+
+class _Slice(Predicate):
+
+    def __init__(self, start, stop, raws):
+        self.start = start
+        self.stop = stop
+        self.raws = frozenset(raws)
+
+    def __call__(self, data):
+        return data[self.start:self.stop] in self.raws
+
+
+class _Prefix(Predicate):
+
+    def __init__(self, start, raw):
+        self.start = start
+        self.stop = start + len(raw)
+        self.raw = raw
+
+    def __call__(self, data):
+        return data[self.start:self.stop] == self.raw
+
+
+class _All(Predicate):
+
+    def __init__(self, predicates):
+        self.predicates = predicates
+
+    def __call__(self, data):
+        for predicate in self.predicates:
+            if not predicate(data):
+                return False
+        return True
+
+
+class _Any(Predicate):
+
+    def __init__(self, predicates):
+        self.predicates = predicates
+
+    def __call__(self, data):
+        for predicate in self.predicates:
+            if predicate(data):
+                return True
+        return False
+
+
+class _Not(Predicate):
+
+    def __init__(self, predicate):
+        self.predicate = predicate
+
+    def __call__(self, data):
+        return not self.predicate(data)
+
+
 class Field(object):
 
     LEFT = 'left'
@@ -146,6 +490,9 @@ class Field(object):
 
     error_type = ValueError
 
+    #: Default `Cache` size used for `cache=True`.
+    cache_size = 1024
+
     copy = [
         'length',
         'required',
@@ -157,6 +504,8 @@ class Field(object):
         ('enum', '_enum'),
         'offset',
         'default',
+        ('cache', '_cache'),
+        ('reserved', '_reserved'),
     ]
 
     def  __init__(self,
@@ -170,6 +519,8 @@ class Field(object):
                   enum=None,
                   default=None,
                   offset=None,
+                  cache=None,
+                  reserved=False,
         ):
         self._order = self._order.next() if order is None else order
         self.name = name
@@ -182,6 +533,7 @@ class Field(object):
         self.pad = self.pad if pad is None else pad
         self.align = self.align if align is None else align
         self._constant = constant
+        self._reserved = reserved
         if isinstance(enum, list):
             if not enum:
                 enum = dict(enum)
@@ -191,11 +543,20 @@ class Field(object):
                 enum = dict(enum)
         self._enum = enum
         self.enum = None
+        self._enum_set = None
         if self._enum:
             for k, v in self._enum.iteritems():
                 setattr(self, k, v)
             self.enum = self._enum.values()
+            self._enum_set = frozenset(self.enum)
         self.offset = offset
+        self._cache = cache
+        self.cache = None
+        self.pack_cache = None
+        if cache:
+            size = self.cache_size if cache is True else cache
+            self.cache = Cache(size)
+            self.pack_cache = Cache(size)
 
     def reserved(self):
         if type(self).default is None:
@@ -206,6 +567,7 @@ class Field(object):
         other = copy.copy(self)
         other._constant = type(self).default
         other.default = other._constant
+        other._reserved = True
         return other
 
     def constant(self, value):
@@ -276,29 +638,49 @@ class Field(object):
 
     def map(self, record, value):
         if value is not None:
-            try:
-                value = self.sanitize(value)
-            except (self.error_type, AttributeError, ValueError, TypeError):
-                pass
-            error = self.validate(value)
-            if error:
-                try:
-                    value = self.load(value)
-                    error = self.validate(value)
-                except (self.error_type, AttributeError, ValueError, TypeError):
-                    pass
-            if error:
-                try:
-                    value = self.load(str(value))
-                    error = self.validate(value)
-                except (self.error_type, AttributeError, ValueError, TypeError):
-                    pass
+            value, error = self.coerce(value)
             if error:
                 raise self.error_type(
                     'Invalid {0}.{1} value {2} for - {3}'
                     .format(type(record).__name__, self.name, value, error)
                 )
-            return value
+        return value
+
+    #: Maps exact value types to functions `coerce`-ing them, all other types
+    #: are coerced by `_coerce_other`.
+    coercions = {}
+
+    def coerce(self, value):
+        """
+        Converts `value` to this field's type returning a `(value, error)`
+        tuple, where `error` is None if the value is valid. Values of types in
+        `coercions` are validated at most once.
+        """
+        coercion = self.coercions.get(type(value))
+        if coercion is None:
+            return self._coerce_other(value)
+        return coercion(self, value)
+
+    def _coerce_other(self, value):
+        # try sanitized, loaded and loaded `str` values in that order
+        try:
+            value = self.sanitize(value)
+        except (self.error_type, AttributeError, ValueError, TypeError):
+            pass
+        error = self.validate(value)
+        if error:
+            try:
+                value = self.load(value)
+                error = self.validate(value)
+            except (self.error_type, AttributeError, ValueError, TypeError):
+                pass
+        if error:
+            try:
+                value = self.load(str(value))
+                error = self.validate(value)
+            except (self.error_type, AttributeError, ValueError, TypeError):
+                pass
+        return value, error
 
     def sanitize(self, value):
         return value
@@ -310,6 +692,20 @@ class Field(object):
         return description
 
     def pack(self, value):
+        if self.pack_cache is None:
+            return self._pack(value)
+        try:
+            key = type(value), value
+            raw = self.pack_cache.get(key)
+        except TypeError:
+            # unhashable
+            return self._pack(value)
+        if raw is None:
+            raw = self._pack(value)
+            self.pack_cache.put(key, raw)
+        return raw
+
+    def _pack(self, value):
         error = self.validate(value)
         if error:
             if isinstance(value, str):
@@ -334,7 +730,19 @@ class Field(object):
     def unpack(self, raw):
         if len(raw) < self.length:
             raise self.error_type('Length must be >= {0}'.format(self.length))
-        raw = raw[:self.length]
+        return self._unpack(raw[:self.length])
+
+    def _unpack(self, raw):
+        # `raw` is exactly `length` long, see `RecordMeta` unpack plan
+        if self.cache is None:
+            return self._unpack_value(raw)
+        value = self.cache.get(raw)
+        if value is None:
+            value = self._unpack_value(raw)
+            self.cache.put(raw, value)
+        return value
+
+    def _unpack_value(self, raw):
         if self.align == self.LEFT:
             value = raw.rstrip(self.pad)
         elif self.align == self.RIGHT:
@@ -359,9 +767,59 @@ class Field(object):
     def load(self, value):
         return value
 
+    def unpack_column(self, data, offset, stride, count):
+        """
+        Unpacks this field from `count` records in `data` spaced `stride`
+        apart starting with the one @ `offset`.
+        """
+        length = self.length
+        return [
+            self._unpack(data[i:i + length])
+            for i in xrange(offset, offset + stride * count, stride)
+        ]
+
+    def eq(self, value):
+        """
+        `Predicate` matching raw records in which this field is `value`.
+        """
+        return self.isin([value])
+
+    def isin(self, values):
+        """
+        `Predicate` matching raw records in which this field is one of
+        `values`.
+        """
+        if self.offset is None:
+            raise TypeError('{0}.offset is None'.format(self))
+        return _Slice(
+            self.offset,
+            self.offset + self.length,
+            [self.pack(value) for value in values],
+        )
+
+    def startswith(self, prefix):
+        """
+        `Predicate` matching raw records in which this, left aligned, field
+        starts with raw `prefix`.
+        """
+        if self.offset is None:
+            raise TypeError('{0}.offset is None'.format(self))
+        if self.align != self.LEFT:
+            raise TypeError('{0} is not left aligned'.format(self))
+        if len(prefix) > self.length:
+            raise self.error_type(
+                'Prefix "{0}" length > {1}'.format(prefix, self.length)
+            )
+        return _Prefix(self.offset, prefix)
+
     def probe(self, io):
         if self.offset is None:
             raise TypeError('{0}.offset is None'.format(self))
+        if isinstance(io, basestring):
+            try:
+                return self.unpack(io[self.offset:self.offset + self.length])
+            except self.error_type:
+                return None
         restore = io.tell()
         try:
             io.seek(self.offset, os.SEEK_CUR)
@@ -385,10 +843,16 @@ class Numeric(Field):
         'min_value',
         ]
 
+    digits_re = re.compile(r'\d+\Z')
+
+    int_re = re.compile(r'\s*[-+]?\d+\s*\Z')
+
     def  __init__(self, *args, **kwargs):
         self.min_value = kwargs.pop('min_value', self.min_value)
         self.max_value = kwargs.pop('max_value', self.max_value)
         super(Numeric, self).__init__(*args, **kwargs)
+        # i.e. len(str(value)) <= length
+        self._bounds = -10 ** (self.length - 1), 10 ** self.length
 
     def load(self, raw):
         if not raw or raw.strip() is '':
@@ -398,15 +862,55 @@ class Numeric(Field):
     def dump(self, value):
         return str(value)
 
+    def unpack_column(self, data, offset, stride, count):
+        if (numpy is not None and
+            count and
+            self.align == self.RIGHT and
+            self.pad == '0' and
+            self.length <= 18):
+            column = self._unpack_column_vector(data, offset, stride, count)
+            if column is not None:
+                return column
+        column = super(Numeric, self).unpack_column(data, offset, stride, count)
+        if numpy is not None:
+            return numpy.array(column, dtype=numpy.int64)
+        return array.array('l', column)
+
+    def _unpack_column_vector(self, data, offset, stride, count):
+        # happy path only, returns None so as to unpack value by value and
+        # report errors in the usual way
+        digits = numpy.ndarray(
+            shape=(count, self.length),
+            dtype=numpy.uint8,
+            buffer=data,
+            offset=offset,
+            strides=(stride, 1),
+        ) - ord('0')
+        if (digits > 9).any():
+            return None
+        column = digits.dot(
+            10 ** numpy.arange(self.length - 1, -1, -1, dtype=numpy.int64)
+        )
+        if self.enum and not numpy.in1d(column, self.enum).all():
+            return None
+        if self.min_value is not None and (column < self.min_value).any():
+            return None
+        if self.max_value is not None and (column > self.max_value).any():
+            return None
+        if self._constant is not None and (column != self._constant).any():
+            return None
+        return column
+
     def validate(self, value):
-        if isinstance(value, basestring) and re.match('\d+', value):
+        if isinstance(value, basestring) and self.digits_re.match(value):
             value = int(value)
         if not isinstance(value, (int, long)):
             return self.error(value, 'must be a whole number')
-        if self.enum and value not in self.enum:
+        if self._enum_set is not None and value not in self._enum_set:
             return self.error(value, 'must be one of {0}, got "{1}"'.format(
                 self.enum, value))
-        if len(str(value)) > self.length:
+        lower, upper = self._bounds
+        if not lower < value < upper:
             return self.error(value, 'must have length <= {0}'.format(self.length))
         if self.min_value is not None and self.min_value > value:
             return self.error(value, 'must be >= {0}'.format(self.min_value))
@@ -415,6 +919,30 @@ class Numeric(Field):
         if self._constant is not None and value != self._constant:
             return self.error(value, 'must be constant {0}'.format(repr(self._constant)))
 
+    def _coerce_number(self, value):
+        return value, self.validate(value)
+
+    def _coerce_string(self, value):
+        if (not self.digits_re.match(value) and
+            value.strip() and
+            not self.int_re.match(value)):
+            return value, self.error(value, 'must be a whole number')
+        return self._coerce_number(self.load(value))
+
+    def _coerce_other(self, value):
+        if isinstance(value, (int, long)):
+            return self._coerce_number(value)
+        if not isinstance(value, basestring):
+            value = str(value)
+        return self._coerce_string(value)
+
+    coercions = {
+        int: _coerce_number,
+        long: _coerce_number,
+        str: _coerce_string,
+        unicode: _coerce_string,
+    }
+
 
 class Alphanumeric(Field):
 
@@ -423,21 +951,37 @@ class Alphanumeric(Field):
     alphabet = string.printable
     default = ''
 
+    _invalid_res = {}
+
+    def __init__(self, *args, **kwargs):
+        super(Alphanumeric, self).__init__(*args, **kwargs)
+        self._invalid_re = self._compile_alphabet(self.alphabet)
+
+    @classmethod
+    def _compile_alphabet(cls, alphabet):
+        invalid_re = cls._invalid_res.get(alphabet)
+        if invalid_re is None:
+            if alphabet:
+                pattern = '[^{0}]'.format(re.escape(alphabet))
+            else:
+                pattern = r'[\s\S]'
+            invalid_re = cls._invalid_res[alphabet] = re.compile(pattern)
+        return invalid_re
+
     def sanitize(self, value):
-        v = value
-        if self.ctx.alpha_filter:
-            v = ''.join(c for c in value if c in self.alphabet)
-        if self.ctx.alpha_truncate:
-            if len(v) > self.length:
-                v = v[:self.length]
-        if self.ctx.alpha_upper:
-            v = v.upper()
-        return v
+        settings = self.ctx.effective
+        if settings['alpha_filter']:
+            value = self._invalid_re.sub('', value)
+        if settings['alpha_truncate'] and len(value) > self.length:
+            value = value[:self.length]
+        if settings['alpha_upper']:
+            value = value.upper()
+        return value
 
     def validate(self, value):
         if not isinstance(value, basestring):
             return self.error(value, 'must be a string')
-        if self.enum and value not in self.enum:
+        if self._enum_set is not None and value not in self._enum_set:
             return self.error(
                 value, 'must be one of {0}, got "{1}"'.format(self.enum, value)
             )
@@ -445,13 +989,30 @@ class Alphanumeric(Field):
             return self.error(
                 value, 'must have length <= {0}'.format(self.length)
             )
-        for i, c in enumerate(value):
-            if c not in self.alphabet:
-                if c not in string.printable:
-                    c = hex(ord(c))
-                return self.error(
-                    value, 'has invalid character "{0}" @ {1}'.format(c, i)
-                )
+        invalid = self._invalid_re.search(value)
+        if invalid:
+            i = invalid.start()
+            c = value[i]
+            if c not in string.printable:
+                c = hex(ord(c))
+            return self.error(
+                value, 'has invalid character "{0}" @ {1}'.format(c, i)
+            )
+
+    def _coerce_string(self, value):
+        value = self.sanitize(value)
+        return value, self.validate(value)
+
+    def _coerce_other(self, value):
+        if not isinstance(value, basestring):
+            # e.g. 5 -> '5'
+            value = str(value)
+        return self._coerce_string(value)
+
+    coercions = {
+        str: _coerce_string,
+        unicode: _coerce_string,
+    }
 
 
 class Datetime(Field):
@@ -481,6 +1042,22 @@ class Datetime(Field):
         'ZZZ': '%Z',  # http://stackoverflow.com/a/14763274
         }
 
+    # (part, dump format, dump getter) for tokens with slice and int codecs
+    codec_spec = {
+        # day
+        'YYYY': ('year', '%04d', lambda x: x.year),
+        'YY': ('yy', '%02d', lambda x: x.year % 100),
+        'DDD': ('julian', '%03d', lambda x: x.timetuple().tm_yday),
+        'DD': ('day', '%02d', lambda x: x.day),
+        'MM': ('month', '%02d', lambda x: x.month),
+        'JJJ': ('julian', '%03d', lambda x: x.timetuple().tm_yday),
+
+        # time
+        'hh': ('hour', '%02d', lambda x: x.hour),
+        'mm': ('minute', '%02d', lambda x: x.minute),
+        'ss': ('second', '%02d', lambda x: x.second),
+        }
+
     copy = [k for k in Field.copy if k != 'length'] + ['format']
 
     time_zones = {
@@ -490,6 +1067,7 @@ class Datetime(Field):
         self.format = format
         super(Datetime, self).__init__(len(self.format), *args, **kwargs)
         self._str_format, self._tz = self._to_str_format(format)
+        self._codec = None if self._tz else self._to_codec(format)
 
     @classmethod
     def _to_str_format(cls, format):
@@ -510,6 +1088,67 @@ class Datetime(Field):
             parts.append(format[prev:])
         return ''.join(parts), tz
 
+    @classmethod
+    def _to_codec(cls, format):
+        # (parts, literals, dump format, dump getters) or None if strptime and
+        # strftime are needed
+        parts, literals, dump_format, getters = [], [], [], []
+        prev = 0
+        for m in cls.format_re.finditer(format):
+            if prev != m.start():
+                literals.append((prev, format[prev:m.start()]))
+                dump_format.append(format[prev:m.start()].replace('%', '%%'))
+            prev = m.end()
+            value = m.group()
+            if value not in cls.codec_spec:
+                return None
+            part, spec, getter = cls.codec_spec[value]
+            parts.append((m.start(), m.end(), part))
+            dump_format.append(spec)
+            getters.append(getter)
+        if prev != len(format):
+            literals.append((prev, format[prev:]))
+            dump_format.append(format[prev:].replace('%', '%%'))
+        return parts, literals, ''.join(dump_format), getters
+
+    def _parse(self, raw):
+        # (year, month, day, hour, minute, second) or None if `raw` is not in
+        # canonical form, in which case strptime gets to decide
+        if self._codec is None or len(raw) != self.length:
+            return None
+        parts, literals, _, _ = self._codec
+        for offset, literal in literals:
+            if not raw.startswith(literal, offset):
+                return None
+        values = {}
+        for start, stop, part in parts:
+            digits = raw[start:stop]
+            if not digits.isdigit():
+                return None
+            values[part] = int(digits)
+        year = values.get('year', 1900)
+        if 'yy' in values:
+            year = values['yy'] + (2000 if values['yy'] < 69 else 1900)
+        month, day = values.get('month', 1), values.get('day', 1)
+        if 'julian' in values:
+            julian = values['julian']
+            if 'month' in values or 'day' in values or not 1 <= julian <= 366:
+                return None
+            date = datetime.date.fromordinal(
+                datetime.date(year, 1, 1).toordinal() + julian - 1
+            )
+            year, month, day = date.year, date.month, date.day
+        return (
+            year, month, day,
+            values.get('hour', 0),
+            values.get('minute', 0),
+            values.get('second', 0),
+        )
+
+    def _format(self, value):
+        _, _, dump_format, getters = self._codec
+        return dump_format % tuple([getter(value) for getter in getters])
+
     @classmethod
     def _extract_tz(cls, raw, spec):
         offset, length = spec
@@ -527,11 +1166,41 @@ class Datetime(Field):
         raw = raw[:offset] + tz + raw[offset:]
         return raw
 
+    #: Type of values.
+    value_type = datetime.datetime
+
     def validate(self, value):
         if not isinstance(value, datetime.datetime):
             return self.error(value, 'must be a datetime')
 
+    def _coerce_value(self, value):
+        return value, self.validate(value)
+
+    def _coerce_string(self, value):
+        try:
+            loaded = self.load(value)
+        except (ValueError, TypeError):
+            # report the value as given
+            return value, self.validate(value)
+        return loaded, self.validate(loaded)
+
+    def _coerce_other(self, value):
+        if isinstance(value, self.value_type):
+            return self._coerce_value(value)
+        if not isinstance(value, basestring):
+            value = str(value)
+        return self._coerce_string(value)
+
+    coercions = {
+        datetime.datetime: _coerce_value,
+        str: _coerce_string,
+        unicode: _coerce_string,
+    }
+
     def load(self, raw):
+        parsed = self._parse(raw)
+        if parsed is not None:
+            return datetime.datetime(*parsed)
         tz = None
         if self._tz:
             raw, tz = self._extract_tz(raw, self._tz)
@@ -547,6 +1216,8 @@ class Datetime(Field):
         return value
 
     def dump(self, value):
+        if self._codec is not None:
+            return self._format(value)
         raw = value.strftime(self._str_format)
         if self._tz:
             raw = self._insert_tz(raw, value.tzname(), self._tz)
@@ -559,16 +1230,35 @@ class Date(Datetime):
         'Y{4}|Y{2}|D{3}|D{2}|M{2}|J{3}'  # day
     )
 
+    value_type = datetime.date
+
+    coercions = dict(Datetime.coercions)
+    coercions[datetime.date] = Datetime._coerce_value.im_func
+
     def validate(self, value):
         if not isinstance(value, datetime.date):
             return self.error(value, 'must be a date')
 
     def load(self, raw):
+        parsed = self._parse(raw)
+        if parsed is not None:
+            return datetime.date(*parsed[:3])
         return datetime.datetime.strptime(raw, self._str_format).date()
 
     def dump(self, value):
+        if self._codec is not None:
+            return self._format(value)
         return value.strftime(self._str_format)
 
+    def unpack_column(self, data, offset, stride, count):
+        column = [
+            value.toordinal() for value in
+            super(Date, self).unpack_column(data, offset, stride, count)
+        ]
+        if numpy is not None:
+            return numpy.array(column, dtype=numpy.int64)
+        return array.array('l', column)
+
 
 class Time(Datetime):
 
@@ -576,48 +1266,156 @@ class Time(Datetime):
         'h{2}|H{2}|m{2}|s{2}|X{2}|Z{3}|p{2}'  # time
     )
 
+    value_type = datetime.time
+
+    coercions = {
+        datetime.time: Datetime._coerce_value.im_func,
+        str: Datetime._coerce_string.im_func,
+        unicode: Datetime._coerce_string.im_func,
+    }
+
     def validate(self, value):
         if not isinstance(value, datetime.time):
             return self.error(value, 'must be a time')
 
     def load(self, raw):
+        parsed = self._parse(raw)
+        if parsed is not None:
+            return datetime.time(*parsed[3:])
         return super(Time, self).load(raw).time()
 
 
+class Layout(collections.namedtuple('Layout', [
+        'fields',
+        'names',
+        'offsets',
+        'lengths',
+        'pads',
+        'aligns',
+        'length',
+        'slices',
+        'constants',
+        'signature',
+        'discriminator',
+    ])):
+    """
+    Immutable byte layout of a record type, as `MyRecord.layout`:
+
+    - `fields` in order along w/ their `names`, `offsets`, `lengths`, `pads`
+      and `aligns`,
+    - `length` of records,
+    - `slices`, a `(name, start, stop)` per field,
+    - `constants`, the packed value of each constant, including reserved,
+      field and None for others,
+    - `signature`, a `(start, stop, raw)` per constant but not reserved field,
+      which identify records of this type, see `BaseRecord.matches`, and
+    - `discriminator`, the `(offset, length)` of the first of those or None,
+      see `Dispatch.from_types`.
+
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def of(cls, fields):
+        """
+        Lays out `fields` back-to-back in order.
+        """
+        offsets, constants, signature = [], [], []
+        offset = 0
+        for field in fields:
+            offsets.append(offset)
+            packed = None
+            if field._constant is not None:
+                packed = field.pack(field._constant)
+                if not field._reserved:
+                    signature.append((offset, offset + field.length, packed))
+            constants.append(packed)
+            offset += field.length
+        lengths = [field.length for field in fields]
+        discriminator = None
+        if signature:
+            start, stop, _ = signature[0]
+            discriminator = start, stop - start
+        return cls(
+            fields=tuple(fields),
+            names=tuple([field.name for field in fields]),
+            offsets=tuple(offsets),
+            lengths=tuple(lengths),
+            pads=tuple([field.pad for field in fields]),
+            aligns=tuple([field.align for field in fields]),
+            length=offset,
+            slices=tuple([
+                (field.name, start, start + length)
+                for field, start, length in zip(fields, offsets, lengths)
+            ]),
+            constants=tuple(constants),
+            signature=tuple(signature),
+            discriminator=discriminator,
+        )
+
+
 class RecordMeta(type):
 
     def __new__(mcs, name, bases, dikt):
+        # keep slotted records, i.e. `CompactRecord`s, slotted
+        if ('__slots__' not in dikt and
+            any(getattr(base, '_slotted', False) for base in bases)):
+            dikt['__slots__'] = ()
+
         cls = type.__new__(mcs, name, bases, dikt)
 
-        # backfill field names
+        # backfill field names, and have fields overriding inherited ones
+        # take their place
         for name, attr in cls.__dict__.items():
-            if isinstance(attr, Field) and attr.name is None:
+            if not isinstance(attr, Field):
+                continue
+            if attr.name is None:
                 attr.name = name
-
-        # cache fields
-        is_field = lambda x: (
-            inspect.isdatadescriptor(x) and isinstance(x, Field)
-        )
-        cls.fields = [
-            field if field.name in cls.__dict__ else copy.copy(field)
-            for _, field in inspect.getmembers(cls, is_field)
-        ]
-        for field in cls.fields:
             for base in bases:
-                if (not hasattr(base, field.name) or
-                    not isinstance(getattr(base, field.name), Field)):
-                    continue
-                field._order = getattr(base, field.name)._order
-        cls.fields = sorted(cls.fields, key=lambda x: x._order)
+                inherited = getattr(base, attr.name, None)
+                if isinstance(inherited, Field):
+                    attr._order = inherited._order
+
+        # cache fields, i.e. attributes resolving to fields as w/ `getattr`
+        # in declaration order
+        members = {}
+        for klass in cls.__mro__:
+            for name, attr in klass.__dict__.iteritems():
+                if name not in members:
+                    members[name] = attr
+        fields = sorted([
+            (name, attr) for name, attr in members.iteritems()
+            if isinstance(attr, Field)
+        ])
+        fields.sort(key=lambda x: x[1]._order)
 
-        # cache field offsets
+        # cache field offsets, inherited fields are shared unless they move
+        cls.fields = []
         offset = 0
-        for field in cls.fields:
+        for name, field in fields:
+            if name not in cls.__dict__ and field.offset != offset:
+                field = copy.copy(field)
             field.offset = offset
             offset += field.length
+            cls.fields.append(field)
+
+        cls.layout = Layout.of(cls.fields)
 
         # cache length
-        cls.length = sum(field.length for field in cls.fields)
+        cls.length = cls.layout.length
+
+        cls._plan()
+
+        # cache field indices, i.e. slots used by `CompactRecord`
+        cls._indices = dict([
+            (field.name, i) for i, field in enumerate(cls.fields)
+        ])
+
+        # cache constant field names, these are not stored in records
+        cls._constants = [
+            field.name for field in cls.fields if field._constant is not None
+        ]
 
         # cache default field values
         cls._defaults = dict([
@@ -627,13 +1425,38 @@ class RecordMeta(type):
 
         return cls
 
+    def _plan(cls):
+        # cache codec, i.e. (name, start, stop, unpack) slice plan for loads
+        # and (get, pack) plan for dumps w/ a get of None for constant fields
+        # which have already been packed
+        cls._unpack_plan = [
+            (field.name, field.offset, field.offset + field.length,
+             field._unpack)
+            for field in cls.fields
+        ]
+        cls._pack_plan = [
+            (None, packed) if packed is not None else (field.__get__, field.pack)
+            for field, packed in zip(cls.fields, cls.layout.constants)
+        ]
+
 
-class Record(dict):
+class BaseRecord(object):
+    """
+    Behavior shared by `Record` and `CompactRecord`, which differ only in how
+    they store field values.
+    """
 
     __metaclass__ = RecordMeta
 
+    __slots__ = ()
+
     field_type = Field
 
+    #: Tag identifying this record type in batches, see `dump_batch`.
+    #: Defaults to "{module}.{name}", so set it to tell apart record types
+    #: that share a name, e.g. ones generated at runtime.
+    batch_tag = None
+
     def __init__(self, **kwargs):
         values = copy.copy(self._defaults)
         values.update(kwargs)
@@ -648,7 +1471,10 @@ class Record(dict):
     @classmethod
     def probe(cls, io):
         if isinstance(io, basestring):
-            io = StringIO.StringIO(io)
+            try:
+                return cls.load(io[:cls.length])
+            except (Field.error_type, TypeError):
+                return None
         restore = io.tell()
         try:
             try:
@@ -658,8 +1484,111 @@ class Record(dict):
         finally:
             io.seek(restore, os.SEEK_SET)
 
+    @classmethod
+    def errors(cls, raw):
+        """
+        Unpacks each field of `raw` on its own returning a `(field, reason)`
+        for each one that is invalid.
+        """
+        errors = []
+        for field, (_, start, stop) in zip(cls.fields, cls.layout.slices):
+            try:
+                field.unpack(raw[start:stop])
+            except Field.error_type, ex:
+                errors.append((field, str(ex)))
+        return errors
+
+    @classmethod
+    def matches(cls, buf, offset=0):
+        """
+        Determines whether `buf`, a `str`, `buffer` or `mmap`, holds a record
+        of this type @ `offset` by comparing the packed values of its
+        constant, but not reserved, fields. Nothing is loaded so this is much
+        cheaper than `probe`.
+        """
+        if len(buf) - offset < cls.length:
+            return False
+        for start, stop, raw in cls.layout.signature:
+            if buf[offset + start:offset + stop] != raw:
+                return False
+        return True
+
     @classmethod
     def load(cls, raw):
+        if len(raw) < cls.length:
+            # short, so let the field that runs out report it
+            return cls._load_fields(raw)
+        values = {}
+        for name, start, stop, unpack in cls._unpack_plan:
+            values[name] = unpack(raw[start:stop])
+        if cls.__init__.im_func is not BaseRecord.__init__.im_func:
+            return cls(**values)
+        return cls._from_unpacked(values, raw)
+
+    @classmethod
+    def _from_unpacked(cls, values, raw=None):
+        """
+        Constructs a record from field `values` that have already been
+        unpacked, and so validated, skipping the `Field.map` done by
+        `__init__`. Records may hold on to `raw`, from which `values` were
+        unpacked, to `dump` unchanged fields as they were loaded.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def load_columns(cls, data, record_size=None):
+        """
+        Loads back-to-back records from `data` into a column per field, e.g.:
+
+        .. code:: python
+
+            columns = MyRecord.load_columns(open('/my/records', 'rb'))
+            print sum(columns['amount'])
+
+        `Numeric` columns are `numpy.int64` arrays if numpy is available and
+        `array('l')` otherwise, `Date` columns are likewise arrays of
+        ordinals and all others are lists of values.
+
+        :param data: String, buffer or file-like object of records.
+        :param record_size:
+            Spacing, in bytes, of records in `data`. Defaults to `length`.
+            Use e.g. `length + 1` for newline terminated records.
+        """
+        start = 0
+        if hasattr(data, 'read'):
+            if hasattr(data, 'fileno'):
+                # from the current position, like `read`
+                start = data.tell()
+                data = Reader._map(data)
+            else:
+                data = data.read()
+        try:
+            layout = cls.layout
+            record_size = record_size or layout.length
+            count, remainder = divmod(
+                max(len(data) - start, 0), record_size
+            )
+            if remainder >= layout.length:
+                count += 1
+            elif remainder:
+                raise Field.error_type(
+                    'Trailing {0} byte(s) are shorter than {1}.length {2}'
+                    .format(remainder, cls.__name__, layout.length)
+                )
+            return dict([
+                (name, field.unpack_column(
+                    data, start + offset, record_size, count
+                ))
+                for field, name, offset in zip(
+                    layout.fields, layout.names, layout.offsets,
+                )
+            ])
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+    @classmethod
+    def _load_fields(cls, raw):
         values = {}
         for f in cls.fields:
             value = f.unpack(raw)
@@ -668,18 +1597,566 @@ class Record(dict):
         return cls(**values)
 
     def dump(self):
-        return ''.join([f.pack(f.__get__(self)) for f in self.fields])
+        return ''.join([
+            pack if get is None else pack(get(self))
+            for get, pack in self._pack_plan
+        ])
 
+    def _splice(self, raw, dirty):
+        # `raw`, as loaded, w/ the fields named `dirty` re-encoded along w/
+        # any constant fields that don't match their packed values, so that
+        # constants always dump as they would have been packed
+        cls = type(self)
+        layout = cls.layout
+        indices = set([
+            cls._indices[key] for key in dirty if key in cls._indices
+        ])
+        for i, packed in enumerate(layout.constants):
+            if packed is not None:
+                _, start, stop = layout.slices[i]
+                if raw[start:stop] != packed:
+                    indices.add(i)
+        if not indices:
+            return raw
+        pieces = []
+        prev = 0
+        for i in sorted(indices):
+            _, start, stop = layout.slices[i]
+            pieces.append(raw[prev:start])
+            packed = layout.constants[i]
+            if packed is None:
+                field = layout.fields[i]
+                packed = field.pack(field.__get__(self))
+            pieces.append(packed)
+            prev = stop
+        pieces.append(raw[prev:])
+        return ''.join(pieces)
+
+
+class Record(BaseRecord, dict):
+    """
+    Record that stores its field values in a `dict`, which it is. Set
+    `keep_raw` to have loaded records remember their encoding and which
+    fields have since been changed so that `dump` only re-encodes those:
 
-class Malformed(ValueError):
+    .. code:: python
+
+        class MyRecord(bryl.Record):
+
+            keep_raw = True
+
+            ...
+
+    """
+
+    #: Flag indicating whether loaded records hold on to what they were
+    #: loaded from, e.g. a line or a `buffer` of a mapped file, which costs
+    #: memory per record.
+    keep_raw = False
+
+    #: Encoding this record was loaded from, if any.
+    _raw = None
+
+    #: Names of fields changed since this record was loaded.
+    _dirty = frozenset()
+
+    @classmethod
+    def _from_unpacked(cls, values, raw=None):
+        for name in cls._constants:
+            values.pop(name, None)
+        record = cls.__new__(cls)
+        dict.update(record, values)
+        if raw is not None and cls.keep_raw:
+            record._raw = raw
+        return record
+
+    def dump(self):
+        raw = self._raw
+        if raw is None:
+            return super(Record, self).dump()
+        if type(raw) is not str or len(raw) != self.length:
+            # e.g. w/ a line terminal or a `buffer`
+            raw = self._raw = str(raw[:self.length])
+        return self._splice(raw, self._dirty)
+
+    # dict, tracking changes
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        if self._raw is not None:
+            self._dirty = self._dirty.union([key])
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        if self._raw is not None:
+            self._dirty = self._dirty.union([key])
+
+    def _forget(self):
+        # for bulk changes, after which everything is re-encoded
+        if self._raw is not None:
+            self._raw = None
+            self._dirty = frozenset()
+
+    def clear(self):
+        self._forget()
+        dict.clear(self)
+
+    def pop(self, *args):
+        self._forget()
+        return dict.pop(self, *args)
+
+    def popitem(self):
+        self._forget()
+        return dict.popitem(self)
+
+    def setdefault(self, key, default=None):
+        self._forget()
+        return dict.setdefault(self, key, default)
+
+    def update(self, *args, **kwargs):
+        self._forget()
+        dict.update(self, *args, **kwargs)
+
+
+class CompactRecord(BaseRecord):
+    """
+    Record that stores its field values in a list slot per field, ordered as
+    `fields`, rather than a `dict`. Use it like `Record` when holding many
+    records in memory:
+
+    .. code:: python
+
+        class MyRecord(bryl.CompactRecord):
+
+            a = bryl.Alphanumeric(length=20)
+
+            b = bryl.Numeric(length=10)
+
+        r = MyRecord.load(raw)
+        assert r.to_dict() == {'a': r.a, 'b': r.b}
+
+    """
+
+    __slots__ = ('_values',)
+
+    _slotted = True
+
+    def __new__(cls, *args, **kwargs):
+        record = super(CompactRecord, cls).__new__(cls)
+        record._values = [_missing] * len(cls.fields)
+        return record
+
+    @classmethod
+    def _from_unpacked(cls, values, raw=None):
+        record = cls.__new__(cls)
+        slots = record._values
+        for field in cls.fields:
+            if field._constant is None:
+                slots[cls._indices[field.name]] = values[field.name]
+        return record
+
+    def to_dict(self):
+        return dict(self.iteritems())
+
+    def __reduce__(self):
+        return _compact_record, (type(self), self.to_dict())
+
+    # mapping, as used by `Field`
+
+    def __getitem__(self, key):
+        value = self._values[self._indices[key]]
+        if value is _missing:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._values[self._indices[key]] = value
+
+    def __delitem__(self, key):
+        self[key]
+        self._values[self._indices[key]] = _missing
+
+    def __contains__(self, key):
+        index = self._indices.get(key)
+        return index is not None and self._values[index] is not _missing
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def iteritems(self):
+        for field, value in itertools.izip(self.fields, self._values):
+            if value is not _missing:
+                yield field.name, value
+
+    def items(self):
+        return list(self.iteritems())
+
+    def keys(self):
+        return [name for name, _ in self.iteritems()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, CompactRecord):
+            other = other.to_dict()
+        if not isinstance(other, dict):
+            return NotImplemented
+        return self.to_dict() == other
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '{0}({1})'.format(type(self).__name__, repr(self.to_dict()))
 
-    def __init__(self, file_name, offset, reason):
+
+class LazyRecord(CompactRecord):
+    """
+    Record that, when loaded, holds on to its raw encoding and only unpacks,
+    and so validates, a field when it is first read:
+
+    .. code:: python
+
+        class MyRecord(bryl.LazyRecord):
+
+            a = bryl.Alphanumeric(length=20)
+
+            b = bryl.Numeric(length=10)
+
+        r = MyRecord.load(raw)  # nothing is unpacked
+        print r.b  # only b is unpacked
+        assert r.dump() is r._raw  # and unmodified records dump as loaded
+        r.b = 12
+        print r.dump()  # only b is re-encoded
+
+    Note that invalid field values are then only reported when read, so use
+    `decode` to eagerly validate all fields.
+    """
+
+    __slots__ = ('_raw', '_dirty')
+
+    def __new__(cls, *args, **kwargs):
+        record = super(LazyRecord, cls).__new__(cls)
+        record._raw = None
+        record._dirty = frozenset()
+        return record
+
+    @classmethod
+    def load(cls, raw):
+        if (len(raw) < cls.length or
+            cls.__init__.im_func is not BaseRecord.__init__.im_func):
+            return super(LazyRecord, cls).load(raw)
+        record = cls.__new__(cls)
+        record._raw = str(raw[:cls.length])
+        record._values = [_pending] * len(cls.fields)
+        return record
+
+    @classmethod
+    def probe(cls, io):
+        record = super(LazyRecord, cls).probe(io)
+        if record is not None:
+            try:
+                record.decode()
+            except (Field.error_type, TypeError):
+                return None
+        return record
+
+    def decode(self):
+        """
+        Unpacks all fields not yet unpacked.
+        """
+        for i, value in enumerate(self._values):
+            if value is _pending:
+                self._decode(i)
+        return self
+
+    def _decode(self, i):
+        field = self.fields[i]
+        start = field.offset
+        value = field._unpack(self._raw[start:start + field.length])
+        if field._constant is not None:
+            value = _missing
+        self._values[i] = value
+        return value
+
+    def dump(self):
+        if self._raw is None:
+            return super(LazyRecord, self).dump()
+        return self._splice(self._raw, self._dirty)
+
+    # mapping, as used by `Field`
+
+    def __getitem__(self, key):
+        i = self._indices[key]
+        value = self._values[i]
+        if value is _pending:
+            value = self._decode(i)
+        if value is _missing:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._values[self._indices[key]] = value
+        if self._raw is not None:
+            self._dirty = self._dirty.union([key])
+
+    def __delitem__(self, key):
+        super(LazyRecord, self).__delitem__(key)
+        if self._raw is not None:
+            self._dirty = self._dirty.union([key])
+
+    def __contains__(self, key):
+        index = self._indices.get(key)
+        if index is None:
+            return False
+        value = self._values[index]
+        if value is _pending:
+            return self.fields[index]._constant is None
+        return value is not _missing
+
+    def iteritems(self):
+        self.decode()
+        return super(LazyRecord, self).iteritems()
+
+
+_missing = object()
+
+_pending = object()
+
+
+def probe_many(record_types, buf, offset=0):
+    """
+    The first of `record_types` that `matches` `buf` @ `offset`, or None. Note
+    that a record type without constant fields matches any long enough `buf`
+    so put those last, e.g.:
+
+    .. code:: python
+
+        class MyLineReader(bryl.LineReader)
+
+            @staticmethod
+            def as_record_type(reader, data, offset):
+                return bryl.probe_many([MyHeader, MyFooter, MyEntry], data)
+
+    """
+    for record_type in record_types:
+        if record_type.matches(buf, offset):
+            return record_type
+
+
+_batch_magic = 'BRYLBAT1'
+
+# (tag length, record length, record count) run header
+_batch_run = struct.Struct('<HII')
+
+
+def _batch_tag(record_type):
+    if record_type.batch_tag is not None:
+        return record_type.batch_tag
+    return '{0}.{1}'.format(record_type.__module__, record_type.__name__)
+
+
+def _batch_types(record_types):
+    # tag -> record type, tags must be unique
+    types = {}
+    for record_type in record_types:
+        tag = _batch_tag(record_type)
+        if types.setdefault(tag, record_type) is not record_type:
+            raise ValueError(
+                '{0} and {1} have the same batch tag "{2}"'
+                .format(types[tag], record_type, tag)
+            )
+    return types
+
+
+def dump_batch(records):
+    """
+    Encodes `records` as runs of back-to-back dumped records of one type, each
+    tagged w/ that type. This is much cheaper than pickling records to hand
+    them to another process, e.g.:
+
+    .. code:: python
+
+        queue.put(bryl.dump_batch(records))
+        ...
+        records = bryl.load_batch(queue.get(), [MyRecord, MyOtherRecord])
+
+    """
+    runs = [
+        (record_type, [record.dump() for record in run])
+        for record_type, run in itertools.groupby(records, type)
+    ]
+    _batch_types([record_type for record_type, _ in runs])
+    pieces = [_batch_magic]
+    for record_type, raws in runs:
+        tag = _batch_tag(record_type)
+        pieces.append(_batch_run.pack(len(tag), record_type.length, len(raws)))
+        pieces.append(tag)
+        pieces.extend(raws)
+    return ''.join(pieces)
+
+
+def load_batch(data, record_types):
+    """
+    Loads the records encoded by `dump_batch` from `data`, a `str`, `buffer`
+    or `mmap`, and so e.g. shared memory.
+
+    :param data: Batch to load.
+    :param record_types:
+        Types of the records in the batch, which must have distinct
+        `batch_tag`s.
+    """
+    if data[:len(_batch_magic)] != _batch_magic:
+        raise ValueError('Not a record batch')
+    types = _batch_types(record_types)
+    records = []
+    position = len(_batch_magic)
+    while position < len(data):
+        tag_length, length, count = _batch_run.unpack_from(data, position)
+        position += _batch_run.size
+        tag = data[position:position + tag_length]
+        position += tag_length
+        record_type = types.get(tag)
+        if record_type is None:
+            raise ValueError('Unexpected record type "{0}"'.format(tag))
+        if length != record_type.length:
+            raise ValueError(
+                '{0} length {1} != {2}'.format(tag, length, record_type.length)
+            )
+        load = record_type.load
+        for start in xrange(position, position + length * count, length):
+            records.append(load(data[start:start + length]))
+        position += length * count
+    return records
+
+
+def _compact_record(record_type, values):
+    # `CompactRecord` unpickler
+    record = record_type.__new__(record_type)
+    for name, value in values.iteritems():
+        record[name] = value
+    return record
+
+
+class Malformed(ValueError):
+
+    def __init__(self, file_name, offset, reason, field=None, line_no=None):
         super(Malformed, self).__init__(
             "{0} @ {1} - {2}".format(file_name, offset, reason)
         )
         self.file_name = file_name
         self.offset = offset
         self.reason = reason
+        self.field = field
+        self.line_no = line_no
+
+
+class Dispatch(object):
+    """
+    Declarative `as_record_type` that looks up record types by discriminator,
+    i.e. a raw slice of each record:
+
+    .. code:: python
+
+        class MyLineReader(bryl.LineReader)
+
+            record_type = MyRecord
+
+            as_record_type = bryl.Dispatch(MyRecord.code, {
+                '1': MyHeaderRecord,
+                '6': MyEntryRecord,
+                '9': MyControlRecord,
+            })
+
+    Readers resolve these with a slice and a `dict` lookup rather than by
+    calling out to a function per record.
+    """
+
+    def __init__(self, discriminator, record_types, default=None):
+        """
+        :param discriminator:
+            Field, or (offset, length), locating the discriminator.
+        :param record_types:
+            Map of discriminator to record type. Non-string discriminators
+            are packed using the `discriminator` field.
+        :param default:
+            Record type to use for unmapped discriminators. If None these
+            are malformed.
+        """
+        if isinstance(discriminator, Field):
+            if discriminator.offset is None:
+                raise TypeError('{0}.offset is None'.format(discriminator))
+            offset, length = discriminator.offset, discriminator.length
+            pack = discriminator.pack
+        else:
+            offset, length = discriminator
+            pack = None
+        self.start = offset
+        self.stop = offset + length
+        self.record_types = {}
+        for key, record_type in record_types.iteritems():
+            if not isinstance(key, basestring):
+                if pack is None:
+                    raise TypeError(
+                        'Discriminator {0} must be a string'.format(repr(key))
+                    )
+                key = pack(key)
+            self.record_types[key] = record_type
+        self.default = default
+
+    @classmethod
+    def from_types(cls, record_types, default=None):
+        """
+        Dispatches on the `Layout.discriminator` shared by `record_types`,
+        i.e. their first constant field:
+
+        .. code:: python
+
+            as_record_type = bryl.Dispatch.from_types(
+                [MyHeaderRecord, MyEntryRecord, MyControlRecord]
+            )
+
+        """
+        discriminators = set([
+            record_type.layout.discriminator for record_type in record_types
+        ])
+        if len(discriminators) != 1 or None in discriminators:
+            raise TypeError(
+                'Record types {0} do not share a discriminator'
+                .format(', '.join([t.__name__ for t in record_types]))
+            )
+        mapping = {}
+        for record_type in record_types:
+            _, _, key = record_type.layout.signature[0]
+            if key in mapping:
+                raise TypeError(
+                    'Record types {0} and {1} have the same discriminator '
+                    '"{2}"'.format(
+                        mapping[key].__name__, record_type.__name__, key,
+                    )
+                )
+            mapping[key] = record_type
+        return cls(discriminators.pop(), mapping, default)
+
+    def lookup(self, data):
+        key = data[self.start:self.stop]
+        record_type = self.record_types.get(key, self.default)
+        if record_type is None:
+            raise Field.error_type(
+                'Unexpected record type discriminator "{0}" @ {1}'
+                .format(key, self.start)
+            )
+        return record_type
+
+    def __call__(self, reader, data, offset):
+        return self.lookup(data)
 
 
 class Reader(collections.Iterator):
@@ -693,9 +2170,18 @@ class Reader(collections.Iterator):
     #: Callable used to probe `record_type` for a persisted record.
     as_record_type = None
 
-    def __init__(self, fo, as_record_type=None):
+    #: Approximate size, in bytes, of the chunks handed to each `parallel`
+    #: worker.
+    parallel_chunk_size = 8 * 1024 * 1024
+
+    #: Number of bytes to `read` from `fo` at a time.
+    chunk_size = 1024 * 1024
+
+    def __init__(self, fo, as_record_type=None, mapped=False, chunk_size=None):
         """
-        :param fo: File-like object from which to read `record_type` records.
+        :param fo:
+            File-like object from which to read `record_type` records or None
+            to `feed` them to this reader.
         :param as_record_type:
             Callable used to determine `record_type` for a persisted record:
 
@@ -704,13 +2190,47 @@ class Reader(collections.Iterator):
             def as_record_type(reader, data, offset):
                 ...
 
+        :param mapped:
+            Flag indicating whether to `mmap` `fo` and decode records directly
+            from the mapping rather than `read` them. Note that in that case
+            `data` passed to `as_record_type` is a read-only `buffer` and `fo`
+            position is left alone.
+        :param chunk_size:
+            Number of bytes to `read` from `fo` at a time. Records are split
+            out of each chunk rather than read one at a time.
         """
         self.fo = fo
         self.name = getattr(self.fo, 'name', '<memory>')
         self.as_record_type = as_record_type or self.as_record_type
         if self.as_record_type is None:
             raise TypeError('Must define as_record_type=')
+        if isinstance(self.as_record_type, Dispatch):
+            self.dispatch = self.as_record_type
+        else:
+            self.dispatch = None
         self.retry = None
+        self.map = self._map(fo) if mapped else None
+        self.predicate = None
+        self.index = None
+        self.errors = []
+        self.chunk_size = chunk_size or self.chunk_size
+        self.buffer = ''
+        self.buffer_offset = 0
+        self.buffer_start = 0
+        if fo is not None and not mapped:
+            try:
+                self.buffer_start = fo.tell()
+            except (AttributeError, IOError):
+                # e.g. a pipe
+                pass
+        self.eof = False
+
+    @staticmethod
+    def _map(fo):
+        if os.fstat(fo.fileno()).st_size == 0:
+            # can't mmap an empty file
+            return ''
+        return mmap.mmap(fo.fileno(), 0, access=mmap.ACCESS_READ)
 
     def next_record(self, expected_type=None, default='raise'):
         raise NotImplementedError
@@ -718,6 +2238,256 @@ class Reader(collections.Iterator):
     def malformed(self, offset, reason):
         raise Malformed(self.name, offset, reason)
 
+    def feed(self, data, eof=False):
+        """
+        Feeds `data`, a chunk of a stream of records, to a reader without an
+        `fo` and iterates the records it completes. This is how to parse
+        records as they arrive from e.g. a socket in an event loop:
+
+        .. code:: python
+
+            reader = MyLineReader(None)
+
+            def on_data(data):
+                for record in reader.feed(data):
+                    ...
+
+            def on_eof():
+                for record in reader.feed('', eof=True):
+                    ...
+
+        :param data: Chunk of records, which need not be whole.
+        :param eof: Flag indicating whether `data` is the last chunk.
+        """
+        if self.fo is not None:
+            raise TypeError('Cannot feed a reader of {0}'.format(self.name))
+        if self.eof:
+            raise TypeError('Cannot feed a reader after eof')
+        self.buffer = self.buffer[self.buffer_offset:] + data
+        self.buffer_start += self.buffer_offset
+        self.buffer_offset = 0
+        self.eof = eof
+        return self
+
+    def fill(self):
+        """
+        Reads the next `chunk_size` bytes of `fo` into `buffer`, returning
+        False if there are none.
+        """
+        if self.fo is None or self.eof:
+            return False
+        data = self.fo.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.buffer_offset:] + data
+        self.buffer_start += self.buffer_offset
+        self.buffer_offset = 0
+        return True
+
+    def seek_record(self, n):
+        """
+        Positions this reader at record number `n` of its `index`.
+        """
+        raise NotImplementedError
+
+    def lookup(self, field, value):
+        """
+        Reads all records in which `field` is `value` using `index`, e.g.:
+
+        .. code:: python
+
+            reader = MyLineReader(open('/my/records', 'rb'))
+            reader.index = bryl.Index.load('/my/records.idx')
+            print reader.lookup(MyRecord.trace, 12334)
+
+        Note that this leaves the reader positioned after the last record read.
+        """
+        if self.index is None:
+            raise TypeError('Must define index=')
+        records = []
+        for n in self.index.lookup(field, value):
+            self.seek_record(n)
+            records.append(self._record(*self._next_data()))
+        return records
+
+    def where(self, *predicates):
+        """
+        Skips, when iterating, raw records not matching all `predicates`
+        before they are loaded, e.g.:
+
+        .. code:: python
+
+            for record in MyLineReader(fo).where(MyRecord.code.eq('27')):
+                ...
+
+        Note that `next_record` does not skip.
+        """
+        if self.predicate is not None:
+            predicates = (self.predicate,) + predicates
+        if len(predicates) == 1:
+            self.predicate = predicates[0]
+        else:
+            self.predicate = _All(list(predicates))
+        return self
+
+    def validate(self, max_errors=None):
+        """
+        Iterates the rest of the valid records and, rather than raising,
+        collects a `Malformed` for each invalid field, or record if no field
+        is to blame, in `errors`, e.g.:
+
+        .. code:: python
+
+            reader = MyLineReader(open('/my/records', 'rb'))
+            for record in reader.validate(max_errors=100):
+                ...
+            for error in reader.errors:
+                print error.line_no, error.offset, error.field, error.reason
+
+        Error offsets are of the invalid field in bytes. Iteration stops once
+        there are `max_errors` errors.
+        """
+        errors = self.errors
+        while max_errors is None or len(errors) < max_errors:
+            start = self._tell() if self.retry is None else None
+            data, position = self._next_data()
+            if data is None:
+                break
+            if self.predicate is not None and not self.predicate(data):
+                continue
+            try:
+                record = self._record(data, position)
+            except Malformed, ex:
+                offset, line_no = self._locate(start, position)
+                errors.extend(
+                    self._errors(data, position, offset, line_no, ex)
+                )
+                if max_errors is not None:
+                    del errors[max_errors:]
+                continue
+            yield record
+
+    def _errors(self, data, position, offset, line_no, ex):
+        try:
+            if self.dispatch is not None:
+                record_type = self.dispatch.lookup(data)
+            else:
+                record_type = self.as_record_type(self, data, position)
+        except Exception:
+            record_type = None
+        if not inspect.isclass(record_type):
+            record_type = None
+        errors = []
+        for field, reason in record_type.errors(data) if record_type else []:
+            errors.append(Malformed(
+                self.name,
+                None if offset is None else offset + field.offset,
+                reason,
+                field=field.name,
+                line_no=line_no,
+            ))
+        if not errors:
+            errors.append(Malformed(
+                self.name, offset, ex.reason, line_no=line_no,
+            ))
+        return errors
+
+    def parallel(self, workers=None, chunk_size=None):
+        """
+        Iterates the rest of the records using a pool of `workers` processes
+        each of which parses a `chunk_size` slice of the file. Records are
+        generated in their original order.
+
+        Note that `fo` must be a named file and that records, record types
+        and `as_record_type` must all be picklable (i.e. module level).
+        """
+        if self.name == '<memory>':
+            raise TypeError('Cannot parse un-named file in parallel')
+        if self.retry:
+            yield self.next()
+        mode = getattr(self.fo, 'mode', 'rb')
+        chunks = self._split(chunk_size or self.parallel_chunk_size)
+        pool = multiprocessing.Pool(workers)
+        try:
+            results = pool.imap(
+                _parse_chunk,
+                [(self, start, stop, mode) for start, stop in chunks],
+            )
+            for (start, stop), (records, count, error) in itertools.izip(
+                    chunks, results
+                ):
+                for record in records:
+                    yield record
+                if error is not None:
+                    offset, reason = error
+                    self.malformed(self._offset(start, offset), reason)
+                self._advance(stop, count)
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def _next_data(self):
+        raise NotImplementedError
+
+    def _tell(self):
+        raise NotImplementedError
+
+    def _reset(self, offset):
+        self.fo.seek(offset, os.SEEK_SET)
+        self.buffer = ''
+        self.buffer_offset = 0
+        self.buffer_start = offset
+        self.eof = False
+
+    def _record(self, data, position):
+        raise NotImplementedError
+
+    def _split(self, chunk_size):
+        raise NotImplementedError
+
+    def _parse_chunk(self, data, mode):
+        records = []
+        try:
+            for record in self:
+                records.append(record)
+        except Malformed, ex:
+            return records, self._position(), (ex.offset, ex.reason)
+        return records, self._position(), None
+
+    def _position(self):
+        raise NotImplementedError
+
+    def _locate(self, start, position):
+        # (byte offset, line number) of data read from `start` @ `position`
+        raise NotImplementedError
+
+    def _offset(self, start, offset):
+        raise NotImplementedError
+
+    def _advance(self, stop, count):
+        raise NotImplementedError
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['fo'] = None
+        state['map'] = None
+        # loaded indexes are mapped too
+        state['index'] = None
+        # instrumentation isn't carried over, see `Stats`
+        for name, value in state.pop('_instrumented', {}).iteritems():
+            if value is _missing:
+                state.pop(name, None)
+            else:
+                state[name] = value
+        if self.fo is not None:
+            # read ahead from fo, which is dropped too
+            state['buffer'] = ''
+            state['buffer_offset'] = 0
+        if state['as_record_type'] is getattr(type(self), 'as_record_type'):
+            state.pop('as_record_type')
+        return state
+
     # collections.Iterator
 
     def __iter__(self):
@@ -747,9 +2517,18 @@ class LineReader(Reader):
                  as_record_type=None,
                  include_terminal=False,
                  expected_terminal=None,
+                 mapped=False,
+                 chunk_size=None,
         ):
-        super(LineReader, self).__init__(fo, as_record_type)
+        super(LineReader, self).__init__(
+            fo, as_record_type, mapped, chunk_size,
+        )
         self.line_no = 1
+        self.map_offset = fo.tell() if mapped else None
+        # universal newline reads are translated so byte offsets into chunks
+        # can't be computed, leave those to readline and tell
+        mode = getattr(fo, 'mode', None)
+        self.universal = isinstance(mode, basestring) and 'U' in mode
         self.include_terminal = include_terminal
         self.expected_terminal = expected_terminal
 
@@ -782,8 +2561,16 @@ class LineReader(Reader):
 
     def next(self):
         line, line_no = self.next_line()
+        if self.predicate is not None:
+            while line is not None and not self.predicate(line):
+                line, line_no = self.next_line()
         if line is None:
             raise StopIteration()
+        return self._record(line, line_no)
+
+    # internals
+
+    def _record(self, line, line_no):
         try:
             record = self.as_record(line, line_no)
         except self.record_type.field_type.error_type, ex:
@@ -798,21 +2585,110 @@ class LineReader(Reader):
             )
         return record, record_terminal
 
-    # internals
-
     def next_line(self):
         if self.retry:
             line, line_no = self.retry
             self.retry = None
+            return line, line_no
+        if self.map is not None:
+            line = self.map_line()
+        elif self.universal:
+            line = self.fo.readline() or None
         else:
-            line = self.fo.readline()
-            if not line:
-                return None, self.line_no
-            line_no = self.line_no
-            self.line_no += 1
+            line = self.buffer_line()
+        if line is None:
+            return None, self.line_no
+        line_no = self.line_no
+        self.line_no += 1
         return line, line_no
 
+    def seek_record(self, n):
+        if self.index is None:
+            raise TypeError('Must define index=')
+        self._seek(self.index.offsets[n])
+        self.line_no = n + 1
+        self.retry = None
+
+    def _next_data(self):
+        return self.next_line()
+
+    def _tell(self):
+        if self.map is not None:
+            return self.map_offset
+        if self.universal:
+            return self.fo.tell()
+        return self.buffer_start + self.buffer_offset
+
+    def _seek(self, offset):
+        if self.map is not None:
+            self.map_offset = offset
+        elif self.universal:
+            self.fo.seek(offset, os.SEEK_SET)
+        else:
+            self._reset(offset)
+
+    def buffer_line(self):
+        while True:
+            offset = self.buffer_offset
+            end = self.buffer.find('\n', offset)
+            if end != -1:
+                end += 1
+                break
+            if not self.fill():
+                if not self.eof or offset >= len(self.buffer):
+                    return None
+                end = len(self.buffer)
+                break
+        self.buffer_offset = end
+        return self.buffer[offset:end]
+
+    def map_line(self):
+        offset = self.map_offset
+        if offset >= len(self.map):
+            return None
+        end = self.map.find('\n', offset)
+        end = len(self.map) if end == -1 else end + 1
+        self.map_offset = end
+        return buffer(self.map, offset, end - offset)
+
+    def _split(self, chunk_size):
+        start = self._tell()
+        size = os.fstat(self.fo.fileno()).st_size
+        chunks = []
+        with open(self.name, 'rb') as fo:
+            while start < size:
+                fo.seek(start + chunk_size - 1)
+                fo.readline()
+                stop = min(fo.tell(), size)
+                chunks.append((start, stop))
+                start = stop
+        return chunks
+
+    def _parse_chunk(self, data, mode):
+        if 'U' in mode:
+            data = data.replace('\r\n', '\n').replace('\r', '\n')
+        self.fo = cStringIO.StringIO(data)
+        self.universal = False
+        self._reset(0)
+        self.line_no = 1
+        return super(LineReader, self)._parse_chunk(data, mode)
+
+    def _position(self):
+        return self.line_no - 1
+
+    def _locate(self, start, position):
+        return start, position
+
+    def _offset(self, start, offset):
+        return self.line_no + offset - 1
+
+    def _advance(self, stop, count):
+        self.line_no += count
+        self._seek(stop)
+
     def as_record(self, line, line_no):
+        if self.dispatch is not None:
+            return self.dispatch.lookup(line).load(line)
         record_type = self.as_record_type(self, line, line_no)
         if inspect.isclass(record_type):
             record = record_type.load(line)
@@ -841,13 +2717,26 @@ class BlockReader(Reader):
 
     """
 
-    #: Fixed size, in bytes, of all records.
+    #: Fixed size, in bytes, of all records, which defaults to the
+    #: `Layout.length` of `record_type`.
     record_size = None
 
-    def __init__(self, fo, as_record_type=None, record_size=None):
-        super(BlockReader, self).__init__(fo, as_record_type)
+    def __init__(self,
+                 fo,
+                 as_record_type=None,
+                 record_size=None,
+                 mapped=False,
+                 chunk_size=None,
+        ):
+        super(BlockReader, self).__init__(
+            fo, as_record_type, mapped, chunk_size,
+        )
         self.record_size = record_size or self.record_size
-        self.block_offset = fo.tell()
+        if self.record_size is None and self.record_type is not None:
+            self.record_size = self.record_type.layout.length or None
+        self.block_offset = self.start_offset = (
+            fo.tell() if mapped else self.buffer_start
+        )
 
     # Reader
 
@@ -879,32 +2768,474 @@ class BlockReader(Reader):
 
     def next(self):
         block, block_offset = self.next_block()
+        if self.predicate is not None:
+            while block is not None and not self.predicate(block):
+                block, block_offset = self.next_block()
         if block is None:
             raise StopIteration()
+        return self._record(block, block_offset)
+
+    # internals
+
+    def _record(self, block, block_offset):
         try:
             record = self.as_record(block, block_offset)
         except self.record_type.field_type.error_type, ex:
             raise self.malformed(block_offset, str(ex))
         return record
 
-    # internals
-
     def next_block(self):
         if self.retry:
             block, block_offset = self.retry
             self.retry = None
+        elif self.map is not None:
+            block_offset = self.block_offset
+            if block_offset >= len(self.map):
+                return None, block_offset
+            block = buffer(self.map, block_offset, self.record_size)
+            self.block_offset = block_offset + len(block)
         else:
-            block = self.fo.read(self.record_size)
-            if not block:
-                return None, self.block_offset
             block_offset = self.block_offset
-            self.block_offset = self.fo.tell()
+            block = self.buffer_block()
+            if block is None:
+                return None, block_offset
+            self.block_offset = block_offset + len(block)
         return block, block_offset
 
+    def buffer_block(self):
+        while True:
+            offset = self.buffer_offset
+            end = offset + self.record_size
+            if end <= len(self.buffer):
+                break
+            if not self.fill():
+                if not self.eof or offset >= len(self.buffer):
+                    return None
+                end = len(self.buffer)
+                break
+        self.buffer_offset = end
+        return self.buffer[offset:end]
+
+    def seek_record(self, n):
+        if self.index is not None:
+            offset = self.index.offsets[n]
+        else:
+            offset = self.start_offset + n * self.record_size
+        self._seek(offset)
+        self.retry = None
+
+    def _next_data(self):
+        return self.next_block()
+
+    def _tell(self):
+        return self.block_offset
+
+    def _seek(self, offset):
+        self.block_offset = offset
+        if self.map is None:
+            self._reset(offset)
+
+    def _split(self, chunk_size):
+        start = self.block_offset
+        size = os.fstat(self.fo.fileno()).st_size
+        chunk_size = max(chunk_size // self.record_size, 1) * self.record_size
+        return [
+            (offset, min(offset + chunk_size, size))
+            for offset in xrange(start, size, chunk_size)
+        ]
+
+    def _parse_chunk(self, data, mode):
+        self.fo = cStringIO.StringIO(data)
+        self._seek(0)
+        return super(BlockReader, self)._parse_chunk(data, mode)
+
+    def _position(self):
+        return self.block_offset
+
+    def _locate(self, start, position):
+        return position, None
+
+    def _offset(self, start, offset):
+        return start + offset
+
+    def _advance(self, stop, count):
+        self._seek(stop)
+
     def as_record(self, block, block_offset):
+        if self.dispatch is not None:
+            return self.dispatch.lookup(block).load(block)
         record_type = self.as_record_type(self, block, block_offset)
         if inspect.isclass(record_type):
             record = record_type.load(block)
         else:
             record = record_type
         return record
+
+
+class Writer(object):
+    """
+    Buffered record writer.
+    """
+
+    #: Number of bytes to buffer before writing them to `fo`.
+    buffer_size = 1024 * 1024
+
+    def __init__(self, fo, buffer_size=None):
+        """
+        :param fo:
+            File-like object to which to write records or None to only
+            `encode_all` them.
+        :param buffer_size:
+            Number of bytes to buffer before writing them to `fo`. Buffered
+            records are joined and written to `fo` in a single call.
+        """
+        self.fo = fo
+        self.name = getattr(self.fo, 'name', '<memory>')
+        self.buffer_size = buffer_size or self.buffer_size
+        self.buffer = []
+        self.buffered = 0
+
+    def write(self, record):
+        try:
+            raw = self.encode(record)
+        except type(record).field_type.error_type, ex:
+            self.malformed(self.position(), str(ex))
+        self.buffer.append(raw)
+        self.buffered += len(raw)
+        self.advance(raw)
+        if self.buffered >= self.buffer_size and self.fo is not None:
+            self.flush()
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+
+    def encode_all(self, records):
+        """
+        Generates encoded `records` in chunks of about `buffer_size` bytes.
+        This is how to stream records to e.g. a socket in an event loop:
+
+        .. code:: python
+
+            writer = bryl.LineWriter(None)
+            for data in writer.encode_all(records):
+                transport.write(data)
+
+        """
+        for record in records:
+            self.write(record)
+            if self.buffered >= self.buffer_size:
+                yield self.drain()
+        data = self.drain()
+        if data:
+            yield data
+
+    def drain(self):
+        """
+        Returns and clears what is buffered.
+        """
+        data = ''.join(self.buffer)
+        self.buffer = []
+        self.buffered = 0
+        return data
+
+    def flush(self):
+        if self.buffer:
+            self.fo.write(self.drain())
+        flush = getattr(self.fo, 'flush', None)
+        if flush:
+            flush()
+
+    def close(self):
+        if self.fo is not None:
+            self.flush()
+
+    def malformed(self, offset, reason):
+        raise Malformed(self.name, offset, reason)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    # internals
+
+    def encode(self, record):
+        raise NotImplementedError
+
+    def position(self):
+        raise NotImplementedError
+
+    def advance(self, raw):
+        raise NotImplementedError
+
+
+class LineWriter(Writer):
+    """
+    Terminal delimited record writer:
+
+    .. code:: python
+
+        with bryl.LineWriter(open('/my/records', 'wb')) as writer:
+            writer.write_all(my_records)
+
+    """
+
+    #: Terminal appended to each record.
+    terminal = '\n'
+
+    def __init__(self, fo, terminal=None, buffer_size=None):
+        super(LineWriter, self).__init__(fo, buffer_size)
+        self.terminal = self.terminal if terminal is None else terminal
+        self.line_no = 1
+
+    # internals
+
+    def encode(self, record):
+        return record.dump() + self.terminal
+
+    def position(self):
+        return self.line_no
+
+    def advance(self, raw):
+        self.line_no += 1
+
+
+class BlockWriter(Writer):
+    """
+    Fixed-size record writer:
+
+    .. code:: python
+
+        with bryl.BlockWriter(open('/my/records', 'wb'), 256) as writer:
+            writer.write_all(my_records)
+
+    """
+
+    #: Fixed size, in bytes, of all records, or None for each record's
+    #: `Layout.length`.
+    record_size = None
+
+    #: Used to pad records out to `record_size`.
+    pad = ' '
+
+    def __init__(self, fo, record_size=None, pad=None, buffer_size=None):
+        super(BlockWriter, self).__init__(fo, buffer_size)
+        self.record_size = record_size or self.record_size
+        self.pad = self.pad if pad is None else pad
+        self.block_offset = fo.tell() if hasattr(fo, 'tell') else 0
+
+    # internals
+
+    def encode(self, record):
+        raw = record.dump()
+        record_size = self.record_size or type(record).layout.length
+        if len(raw) > record_size:
+            raise type(record).field_type.error_type(
+                '{0}.length {1} > record size {2}'
+                .format(type(record).__name__, len(raw), record_size)
+            )
+        return raw + self.pad * (record_size - len(raw))
+
+    def position(self):
+        return self.block_offset
+
+    def advance(self, raw):
+        self.block_offset += len(raw)
+
+
+class Index(object):
+    """
+    Byte offsets of the records in a file and, optionally, the record numbers
+    of key field values. Build one from a reader:
+
+    .. code:: python
+
+        with open('/my/records', 'rb') as fo:
+            index = bryl.Index.build(
+                MyLineReader(fo),
+                fields=[MyRecord.trace],
+                where=MyRecord.code.eq('6'),
+            )
+        index.save('/my/records.idx')
+
+    and then use it for random access:
+
+    .. code:: python
+
+        reader = MyLineReader(open('/my/records', 'rb'))
+        reader.index = bryl.Index.load('/my/records.idx')
+        reader.seek_record(1000)
+        print reader.next()
+        print reader.lookup(MyRecord.trace, 12334)
+
+    Saved indexes are mapped rather than read when loaded. They use native
+    unsigned longs and so are not portable across architectures.
+    """
+
+    magic = 'BRYLIDX1'
+
+    typecode = 'L'
+
+    def __init__(self, offsets, keys=None):
+        """
+        :param offsets: Sequence of record byte offsets.
+        :param keys:
+            Map of field name to (length, raw values, record numbers) where
+            raw values are sorted, back-to-back and `length` long.
+        """
+        self.offsets = offsets
+        self.keys = keys or {}
+
+    @classmethod
+    def build(cls, reader, fields=(), where=None):
+        """
+        Indexes the rest of the records read by `reader`.
+
+        :param reader: `Reader` to index.
+        :param fields: Key fields to index.
+        :param where:
+            Optional `Predicate` selecting the raw records from which to index
+            `fields`, e.g. those of the record type `fields` belong to.
+        """
+        offsets = array.array(cls.typecode)
+        keys = dict([(field.name, []) for field in fields])
+        n = 0
+        while True:
+            offset = reader._tell()
+            data, _ = reader._next_data()
+            if data is None:
+                break
+            offsets.append(offset)
+            if fields and (where is None or where(data)):
+                for field in fields:
+                    start = field.offset
+                    keys[field.name].append(
+                        (data[start:start + field.length], n)
+                    )
+            n += 1
+        for field in fields:
+            pairs = keys[field.name]
+            pairs.sort()
+            keys[field.name] = (
+                field.length,
+                ''.join([raw for raw, _ in pairs]),
+                array.array(cls.typecode, [number for _, number in pairs]),
+            )
+        return cls(offsets, keys)
+
+    def lookup(self, field, value):
+        """
+        Record numbers, in order, of records in which `field` is `value`.
+        """
+        if field.name not in self.keys:
+            raise LookupError('{0} is not indexed'.format(field.name))
+        length, raws, numbers = self.keys[field.name]
+        raw = field.pack(value)
+        lo, hi = 0, len(numbers)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if raws[mid * length:(mid + 1) * length] < raw:
+                lo = mid + 1
+            else:
+                hi = mid
+        matches = []
+        while (lo < len(numbers) and
+               raws[lo * length:(lo + 1) * length] == raw):
+            matches.append(numbers[lo])
+            lo += 1
+        return matches
+
+    def save(self, path):
+        item_size = array.array(self.typecode).itemsize
+        with open(path, 'wb') as fo:
+            fo.write(self.magic)
+            fo.write(struct.pack(
+                '<cBQI',
+                sys.byteorder[0],
+                item_size,
+                len(self.offsets),
+                len(self.keys),
+            ))
+            fo.write(_to_array(self.typecode, self.offsets).tostring())
+            for name, (length, raws, numbers) in sorted(self.keys.items()):
+                fo.write(struct.pack('<HII', len(name), length, len(numbers)))
+                fo.write(name)
+                fo.write(raws)
+                fo.write(_to_array(self.typecode, numbers).tostring())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as fo:
+            data = Reader._map(fo)
+        if data[:len(cls.magic)] != cls.magic:
+            raise ValueError('{0} is not an index'.format(path))
+        position = len(cls.magic)
+        byte_order, item_size, count, key_count = struct.unpack_from(
+            '<cBQI', data, position
+        )
+        position += struct.calcsize('<cBQI')
+        if (byte_order != sys.byteorder[0] or
+            item_size != array.array(cls.typecode).itemsize):
+            raise ValueError(
+                '{0} was saved on an incompatible architecture'.format(path)
+            )
+        offsets = _ArrayView(cls.typecode, data, position, count)
+        position += count * item_size
+        keys = {}
+        for _ in xrange(key_count):
+            name_length, length, count = struct.unpack_from(
+                '<HII', data, position
+            )
+            position += struct.calcsize('<HII')
+            name = data[position:position + name_length]
+            position += name_length
+            raws = buffer(data, position, count * length)
+            position += count * length
+            numbers = _ArrayView(cls.typecode, data, position, count)
+            position += count * item_size
+            keys[name] = length, raws, numbers
+        return cls(offsets, keys)
+
+
+class _ArrayView(object):
+    # read-only, typed, view of a buffer
+
+    def __init__(self, typecode, data, offset, count):
+        self.format = typecode
+        self.size = struct.calcsize(typecode)
+        self.data = data
+        self.offset = offset
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError('index out of range')
+        return struct.unpack_from(
+            self.format, self.data, self.offset + i * self.size
+        )[0]
+
+    def __iter__(self):
+        for i in xrange(self.count):
+            yield self[i]
+
+
+def _to_array(typecode, values):
+    if isinstance(values, array.array) and values.typecode == typecode:
+        return values
+    return array.array(typecode, values)
+
+
+def _parse_chunk(args):
+    # `Reader.parallel` worker
+    reader, start, stop, mode = args
+    with open(reader.name, 'rb') as fo:
+        fo.seek(start, os.SEEK_SET)
+        data = fo.read(stop - start)
+    return reader._parse_chunk(data, mode)
@@ -0,0 +1,264 @@
+"""
+Throughput benchmarks for synthetic record types, e.g.:
+
+.. code:: bash
+
+    $ python -m bryl.bench --count 100000 --width 94 --width 512 > bench.json
+
+Each line of output is a JSON object describing one benchmark run so that
+results from different versions can be compared.
+
+Each benchmark runs in a fresh process, which generates its own test data,
+so that memory use can be compared too:
+
+- `peak_rss_kb` is the peak resident set size of that process, so includes
+  the test data, and
+- `peak_rss_growth_kb` is how much the benchmark itself grew that peak, i.e.
+  beyond what generating the test data needed.
+
+Both are None where the `resource` module isn't available.
+"""
+from __future__ import absolute_import
+
+import cStringIO
+import datetime
+import json
+import multiprocessing
+import optparse
+import platform
+import random
+import sys
+import timeit
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import bryl
+
+
+#: Field types cycled through to build a record type for each mix.
+MIXES = {
+    'numeric': ['numeric'],
+    'alphanumeric': ['alphanumeric'],
+    'date': ['date', 'datetime'],
+    'mixed': [
+        'numeric', 'alphanumeric', 'date', 'datetime', 'constant', 'reserved',
+    ],
+}
+
+BENCHMARKS = [
+    'load',
+    'dump',
+    'construct',
+    'line_reader',
+    'block_reader',
+]
+
+
+def record_type(width, mix):
+    """
+    Generates a record type `width` bytes long composed of `mix` fields.
+    """
+    kinds = MIXES[mix]
+    attrs = {}
+    length = 0
+    i = 0
+    while True:
+        kind = kinds[i % len(kinds)]
+        field = _field(kind, i)
+        if length + field.length > width:
+            break
+        attrs['f{0}_{1}'.format(i, kind)] = field
+        length += field.length
+        i += 1
+    if length < width:
+        attrs['filler'] = bryl.Alphanumeric(length=width - length).reserved()
+    name = 'Bench{0}{1}'.format(mix.title(), width)
+    return type(name, (bryl.Record,), attrs)
+
+
+def _field(kind, i):
+    if kind == 'numeric':
+        return bryl.Numeric(length=6 + i % 7)
+    if kind == 'alphanumeric':
+        return bryl.Alphanumeric(length=8 + i % 9)
+    if kind == 'date':
+        return bryl.Date('YYMMDD')
+    if kind == 'datetime':
+        return bryl.Datetime('YYYYMMDDhhmm')
+    if kind == 'constant':
+        return bryl.Numeric(length=2).constant(i % 100)
+    if kind == 'reserved':
+        return bryl.Alphanumeric(length=4).reserved()
+    raise ValueError('Unknown field kind "{0}"'.format(kind))
+
+
+def values(record_type, rnd):
+    """
+    Generates random field values for `record_type`.
+    """
+    values = {}
+    for field in record_type.fields:
+        if field._constant is not None:
+            continue
+        if isinstance(field, bryl.Numeric):
+            value = rnd.randint(0, 10 ** field.length - 1)
+        elif isinstance(field, bryl.Alphanumeric):
+            value = ''.join(
+                rnd.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 ')
+                for _ in xrange(rnd.randint(0, field.length))
+            ).strip()
+        elif isinstance(field, bryl.Date):
+            value = datetime.date(2000, 1, 1) + datetime.timedelta(
+                days=rnd.randint(0, 9000)
+            )
+        elif isinstance(field, bryl.Datetime):
+            value = datetime.datetime(2000, 1, 1) + datetime.timedelta(
+                minutes=rnd.randint(0, 9000 * 24 * 60)
+            )
+        else:
+            continue
+        values[field.name] = value
+    return values
+
+
+def peak_rss():
+    """
+    Peak resident set size, in KiB, of this process or None if unknown.
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss //= 1024
+    return rss
+
+
+def run(record_type, count, benchmarks=None, seed=0):
+    """
+    Runs `benchmarks` over `count` random `record_type` records and returns a
+    result `dict` for each.
+
+    Note that peak memory use never decreases so, for memory use that is
+    comparable, run a single benchmark per fresh process as `run_isolated`
+    does.
+    """
+    rnd = random.Random(seed)
+    kwargs = [values(record_type, rnd) for _ in xrange(count)]
+    records = [record_type(**kw) for kw in kwargs]
+    raws = [record.dump() for record in records]
+    lines = ''.join(raw + '\n' for raw in raws)
+    blocks = ''.join(raws)
+
+    as_record_type = staticmethod(lambda reader, data, offset: record_type)
+
+    class LineReader(bryl.LineReader):
+        pass
+
+    LineReader.record_type = record_type
+    LineReader.as_record_type = as_record_type
+
+    class BlockReader(bryl.BlockReader):
+        pass
+
+    BlockReader.record_type = record_type
+    BlockReader.as_record_type = as_record_type
+    BlockReader.record_size = record_type.length
+
+    cases = {
+        'load': (lambda: [record_type.load(raw) for raw in raws], blocks),
+        'dump': (lambda: [record.dump() for record in records], blocks),
+        'construct': (lambda: [record_type(**kw) for kw in kwargs], blocks),
+        'line_reader': (
+            lambda: list(LineReader(cStringIO.StringIO(lines))), lines,
+        ),
+        'block_reader': (
+            lambda: list(BlockReader(cStringIO.StringIO(blocks))), blocks,
+        ),
+    }
+
+    results = []
+    for benchmark in benchmarks or BENCHMARKS:
+        func, data = cases[benchmark]
+        rss = peak_rss()
+        start = timeit.default_timer()
+        func()
+        seconds = timeit.default_timer() - start
+        peak = peak_rss()
+        results.append({
+            'benchmark': benchmark,
+            'record_type': record_type.__name__,
+            'width': record_type.length,
+            'fields': len(record_type.fields),
+            'records': count,
+            'bytes': len(data),
+            'seconds': seconds,
+            'records_per_sec': count / seconds if seconds else None,
+            'mb_per_sec': (
+                len(data) / seconds / (1024 * 1024) if seconds else None
+            ),
+            'peak_rss_kb': peak,
+            'peak_rss_growth_kb': peak - rss if peak is not None else None,
+            'bryl': bryl.__version__,
+            'python': platform.python_version(),
+        })
+    return results
+
+
+def run_isolated(width, mix, count, benchmark, seed=0):
+    """
+    Runs `benchmark` over `count` random records of a `width` byte `mix`
+    record type in a fresh process and returns its result `dict`.
+    """
+    pool = multiprocessing.Pool(1)
+    try:
+        return pool.apply(_run, (width, mix, count, benchmark, seed))
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _run(width, mix, count, benchmark, seed):
+    # generated record types can't be pickled, so generate them here
+    return run(record_type(width, mix), count, [benchmark], seed)[0]
+
+
+def main(argv=None, out=None):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option(
+        '-n', '--count', type='int', default=10000,
+        help='number of records per benchmark (%default)',
+    )
+    parser.add_option(
+        '-w', '--width', type='int', action='append', dest='widths',
+        help='record width, repeatable (94 and 512)',
+    )
+    parser.add_option(
+        '-m', '--mix', action='append', dest='mixes', choices=sorted(MIXES),
+        help='field mix, repeatable, one of {0} (all)'.format(sorted(MIXES)),
+    )
+    parser.add_option(
+        '-b', '--benchmark', action='append', dest='benchmarks',
+        choices=BENCHMARKS,
+        help='benchmark, repeatable, one of {0} (all)'.format(BENCHMARKS),
+    )
+    parser.add_option(
+        '-s', '--seed', type='int', default=0,
+        help='random seed (%default)',
+    )
+    options, _ = parser.parse_args(argv)
+    out = out or sys.stdout
+    for mix in options.mixes or sorted(MIXES):
+        for width in options.widths or [94, 512]:
+            for benchmark in options.benchmarks or BENCHMARKS:
+                result = run_isolated(
+                    width, mix, options.count, benchmark, options.seed,
+                )
+                out.write(json.dumps(result, sort_keys=True) + '\n')
+                out.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -53,6 +53,11 @@ setuptools.setup(
     cmdclass={
         'test': PyTest,
     },
+    entry_points={
+        'console_scripts': [
+            'bryl-bench = bryl.bench:main',
+        ],
+    },
     classifiers=[
         'Intended Audience :: Developers',
         'Development Status :: 4 - Beta',
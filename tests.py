@@ -1,8 +1,65 @@
+import datetime
+import StringIO
+
 import pytest
 
 import bryl
 
 
+class Entry(bryl.Record):
+
+    code = bryl.Alphanumeric(length=2)
+
+    amount = bryl.Numeric(length=6)
+
+
+class EntryLineReader(bryl.LineReader):
+
+    record_type = Entry
+
+    @staticmethod
+    def as_record_type(reader, data, offset):
+        return Entry
+
+
+class EntryBlockReader(bryl.BlockReader):
+
+    record_type = Entry
+
+    record_size = Entry.length
+
+    @staticmethod
+    def as_record_type(reader, data, offset):
+        return Entry
+
+
+class CompactEntry(bryl.CompactRecord):
+
+    code = bryl.Alphanumeric(length=2)
+
+    amount = bryl.Numeric(length=6)
+
+    filler = bryl.Alphanumeric(length=2).reserved()
+
+
+class Header(bryl.Record):
+
+    code = bryl.Alphanumeric(length=2).constant('HH')
+
+    name = bryl.Alphanumeric(length=6)
+
+
+class DispatchLineReader(bryl.LineReader):
+
+    record_type = bryl.Record
+
+    as_record_type = bryl.Dispatch((0, 2), {'HH': Header}, default=Entry)
+
+
+def entries(count):
+    return [Entry(code=str(i % 7), amount=i) for i in xrange(count)]
+
+
 def test_reserved():
 
     class Record(bryl.Record):
@@ -30,3 +87,888 @@ def test_reserved():
 
     # and are the same
     assert r1 == r2
+
+
+def test_load_plan():
+
+    class Record(bryl.Record):
+
+        a = bryl.Alphanumeric(length=10)
+
+        b = bryl.Numeric(length=5)
+
+        c = bryl.Date('YYYYMMDD')
+
+        d = bryl.Alphanumeric(length=4).reserved()
+
+    raw = 'hello'.ljust(10) + '00123' + '20140102' + ' ' * 4
+    r = Record.load(raw)
+    assert r == Record._load_fields(raw)
+    assert r.dump() == raw
+
+    # short records are reported by the field that runs out
+    with pytest.raises(ValueError) as exc_info:
+        Record.load(raw[:12])
+    assert 'Length must be >= 5' in str(exc_info.value)
+
+
+def test_load_trusted():
+
+    class Record(bryl.Record):
+
+        a = bryl.Alphanumeric(length=10)
+
+        b = bryl.Numeric(length=5).constant(7)
+
+        c = bryl.Numeric(length=5)
+
+    raw = 'hello'.ljust(10) + '00007' + '00123'
+    r = Record.load(raw)
+    assert r == Record(a='hello', c=123)
+    assert 'b' not in r
+    assert r.b == 7
+
+    # constants are still checked
+    with pytest.raises(ValueError):
+        Record.load('hello'.ljust(10) + '00008' + '00123')
+
+    class Custom(Record):
+
+        def __init__(self, **kwargs):
+            kwargs['a'] = kwargs['a'].upper()
+            super(Custom, self).__init__(**kwargs)
+
+    assert Custom.load(raw).a == 'HELLO'
+
+
+def test_mapped(tmpdir):
+
+    class Record(bryl.Record):
+
+        a = bryl.Alphanumeric(length=4)
+
+        b = bryl.Numeric(length=4)
+
+    records = [Record(a='r{0}'.format(i), b=i) for i in range(5)]
+
+    class MyLineReader(bryl.LineReader):
+
+        record_type = Record
+
+        @staticmethod
+        def as_record_type(reader, data, offset):
+            return Record
+
+    class MyBlockReader(bryl.BlockReader):
+
+        record_type = Record
+
+        record_size = Record.length
+
+        as_record_type = staticmethod(MyLineReader.as_record_type)
+
+    path = tmpdir.join('lines')
+    path.write(''.join(r.dump() + '\n' for r in records))
+    with open(str(path), 'rb') as fo:
+        reader = MyLineReader(fo, include_terminal=True, mapped=True)
+        assert list(reader) == [(r, '\n') for r in records]
+
+    path = tmpdir.join('blocks')
+    path.write(''.join(r.dump() for r in records) + 'r5')
+    with open(str(path), 'rb') as fo:
+        reader = MyBlockReader(fo, mapped=True)
+        assert [reader.next() for _ in records] == records
+        with pytest.raises(bryl.Malformed) as exc_info:
+            reader.next()
+        assert exc_info.value.offset == 5 * Record.length
+
+    path = tmpdir.join('empty')
+    path.write('')
+    with open(str(path), 'rb') as fo:
+        assert list(MyBlockReader(fo, mapped=True)) == []
+
+
+def test_parallel(tmpdir):
+    records = entries(1000)
+
+    path = tmpdir.join('lines')
+    path.write(''.join(r.dump() + '\r\n' for r in records))
+    with open(str(path), 'rU') as fo:
+        reader = EntryLineReader(fo)
+        assert reader.next() == records[0]
+        assert list(reader.parallel(workers=2, chunk_size=512)) == records[1:]
+        assert reader.line_no == 1001
+
+    path = tmpdir.join('blocks')
+    path.write(''.join(r.dump() for r in records))
+    with open(str(path), 'rb') as fo:
+        reader = EntryBlockReader(fo)
+        assert list(reader.parallel(workers=2, chunk_size=500)) == records
+
+    path = tmpdir.join('malformed')
+    path.write(''.join(
+        (r.dump() if i != 700 else 'x' * Entry.length) + '\n'
+        for i, r in enumerate(records)
+    ))
+    with open(str(path), 'rb') as fo:
+        parsed = []
+        with pytest.raises(bryl.Malformed) as exc_info:
+            for record in EntryLineReader(fo).parallel(2, chunk_size=512):
+                parsed.append(record)
+        assert exc_info.value.offset == 701
+        assert parsed == records[:700]
+
+
+@pytest.mark.parametrize('vectorize', [True, False])
+def test_load_columns(tmpdir, monkeypatch, vectorize):
+    if not vectorize:
+        monkeypatch.setattr(bryl, 'numpy', None)
+
+    class Record(bryl.Record):
+
+        code = bryl.Alphanumeric(length=2)
+
+        amount = bryl.Numeric(length=6)
+
+        date = bryl.Date('YYMMDD')
+
+    records = [
+        Record(
+            code=str(i % 3),
+            amount=i * 11,
+            date=datetime.date(2014, 1, 1 + i % 28),
+        )
+        for i in xrange(100)
+    ]
+    data = ''.join(r.dump() + '\n' for r in records)
+    columns = Record.load_columns(data, record_size=Record.length + 1)
+    assert list(columns['code']) == [r.code for r in records]
+    assert list(columns['amount']) == [r.amount for r in records]
+    assert sum(columns['amount']) == sum(r.amount for r in records)
+    assert list(columns['date']) == [r.date.toordinal() for r in records]
+
+    with pytest.raises(ValueError):
+        Record.load_columns(data.replace('000033', '0000x3'), Record.length + 1)
+    with pytest.raises(ValueError):
+        Record.load_columns(data[:-10], Record.length + 1)
+
+    # from the current position of files
+    path = tmpdir.join('columns')
+    path.write('HEADER\n' + data)
+    with open(str(path), 'rb') as fo:
+        fo.readline()
+        loaded = Record.load_columns(fo, Record.length + 1)
+    assert list(loaded['amount']) == list(columns['amount'])
+    assert list(loaded['date']) == list(columns['date'])
+    fo = StringIO.StringIO('HEADER\n' + data)
+    fo.readline()
+    loaded = Record.load_columns(fo, Record.length + 1)
+    assert list(loaded['amount']) == list(columns['amount'])
+
+
+def test_writers(tmpdir):
+    records = entries(100)
+
+    path = tmpdir.join('lines')
+    with open(str(path), 'wb') as fo:
+        with bryl.LineWriter(fo, buffer_size=64) as writer:
+            writer.write_all(records)
+            assert writer.line_no == 101
+    with open(str(path), 'rb') as fo:
+        assert list(EntryLineReader(fo)) == records
+
+    path = tmpdir.join('blocks')
+    with open(str(path), 'wb') as fo:
+        with bryl.BlockWriter(fo, record_size=10) as writer:
+            writer.write_all(records)
+            bad = Entry(code='1', amount=1)
+            bad['amount'] = 10 ** 7
+            with pytest.raises(bryl.Malformed) as exc_info:
+                writer.write(bad)
+            assert exc_info.value.offset == 1000
+    assert path.size() == 1000
+    with open(str(path), 'rb') as fo:
+        assert list(EntryBlockReader(fo, record_size=10)) == records
+
+
+def test_validate():
+    n = bryl.Numeric(
+        length=3, enum=[('a', 1), ('b', 22), ('c', 333), ('d', 4444)],
+    )
+    assert n.validate(22) is None
+    assert n.validate('022') is None
+    assert 'must be one of' in n.validate(5)
+    assert 'length <= 3' in n.validate(4444)
+    assert 'whole number' in n.validate('22a')
+    assert bryl.Numeric(length=2, min_value=None).validate(-9) is None
+    assert 'length <= 2' in bryl.Numeric(length=2, min_value=None).validate(-10)
+
+    a = bryl.Alphanumeric(length=5)
+    assert a.validate('ab c\t') is None
+    assert a.validate(u'abc') is None
+    assert 'invalid character "0xe9" @ 2' in a.validate(u'ab\xe9')
+    assert 'length <= 5' in a.validate('abcdef')
+
+    class Digits(bryl.Alphanumeric):
+
+        alphabet = '0123456789-'
+
+    d = Digits(length=5)
+    assert d.validate('12-3') is None
+    assert 'invalid character "a" @ 1' in d.validate('1a3')
+
+
+def test_coerce():
+    n = bryl.Numeric(length=3, min_value=None)
+    assert n.coerce(12) == (12, None)
+    assert n.coerce(12L) == (12L, None)
+    assert n.coerce(True) == (True, None)
+    assert n.coerce('012') == (12, None)
+    assert n.coerce(u' -9 ') == (-9, None)
+    assert n.coerce('  ') == (0, None)
+    assert n.coerce('1.5') == ('1.5', 'must be a whole number')
+    assert n.coerce(1.5) == ('1.5', 'must be a whole number')
+    assert n.coerce('1000')[1] == 'must have length <= 3'
+
+    a = bryl.Alphanumeric(length=3)
+    assert a.coerce('ab') == ('ab', None)
+    assert a.coerce(12) == ('12', None)
+    assert a.coerce(1234) == ('1234', 'must have length <= 3')
+
+    d = bryl.Date('YYYYMMDD')
+    today = datetime.date(2014, 1, 2)
+    assert d.coerce(today) == (today, None)
+    assert d.coerce('20140102') == (today, None)
+    assert d.coerce(20140102) == (today, None)
+    assert d.coerce('2014') == ('2014', 'must be a date')
+    t = bryl.Time('hhmm')
+    assert t.coerce('0102') == (datetime.time(1, 2), None)
+    assert t.coerce(today) == ('2014-01-02', 'must be a time')
+
+    with pytest.raises(bryl.Field.error_type) as exc_info:
+        Entry(amount='12a')
+    assert str(exc_info.value) == (
+        'Invalid Entry.amount value 12a for - must be a whole number'
+    )
+    assert Entry(code='a', amount='12') == Entry(code='a', amount=12)
+
+
+def test_date_codecs():
+    fields = [
+        bryl.Date('YYYYMMDD'),
+        bryl.Date('YYMMDD'),
+        bryl.Date('YY-MM-DD'),
+        bryl.Date('YYJJJ'),
+        bryl.Datetime('YYYYMMDDhhmmss'),
+        bryl.Datetime('YYMMDD hh:mm'),
+        bryl.Time('hhmm'),
+        bryl.Time('hh:mm:ss'),
+    ]
+    raws = [
+        '20140102', '991231', '00-02-29', '14365', '20140102030405',
+        '680101 23:59', '2359', '01:02:03',
+    ]
+    for field, raw in zip(fields, raws):
+        assert field._codec is not None
+        value = field.load(raw)
+        if isinstance(field, bryl.Date):
+            expected = datetime.datetime.strptime(raw, field._str_format).date()
+        elif isinstance(field, bryl.Time):
+            expected = datetime.datetime.strptime(raw, field._str_format).time()
+        else:
+            expected = datetime.datetime.strptime(raw, field._str_format)
+        assert value == expected
+        assert type(value) == type(expected)
+        assert field.dump(value) == raw
+
+    # non-canonical, invalid and exotic values fall back to strptime
+    assert bryl.Date('YYYYMMDD').load('201412') == datetime.date(2014, 1, 2)
+    for raw in ['20141301', '20140230', '2014010x']:
+        with pytest.raises(ValueError):
+            bryl.Date('YYYYMMDD').load(raw)
+    assert bryl.Time('HHmmpp')._codec is None
+    assert bryl.Time('HHmmpp').load('0130PM') == datetime.time(13, 30)
+
+
+def test_cache():
+
+    class Record(bryl.Record):
+
+        code = bryl.Alphanumeric(length=3, cache=2)
+
+        date = bryl.Date('YYMMDD', cache=True)
+
+    assert Record.date.cache.size == bryl.Field.cache_size
+    raws = ['abc140101', 'abc140101', 'xyz140101', 'ijk140102', 'abc140101']
+    records = [Record.load(raw) for raw in raws]
+    assert [r.dump() for r in records] == raws
+    assert records[0] == records[1]
+    assert records[3].date == datetime.date(2014, 1, 2)
+
+    # bounded
+    cache = Record.code.cache
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (1, 4)
+    assert (Record.date.cache.hits, Record.date.cache.misses) == (3, 2)
+    assert Record.code.pack_cache.hits == 1
+
+    # errors are not cached
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            Record.load('abc14010x')
+
+    # and copies get their own
+    reserved = bryl.Alphanumeric(length=3, cache=10).constant('   ')
+    assert reserved.cache is not None
+    assert reserved.cache is not Record.code.cache
+
+
+def test_bench():
+    import json
+
+    import bryl.bench
+
+    out = StringIO.StringIO()
+    bryl.bench.main(['-n', '10', '-w', '94', '-m', 'mixed'], out=out)
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [r['benchmark'] for r in results] == bryl.bench.BENCHMARKS
+    for result in results:
+        assert result['width'] == 94
+        assert result['records'] == 10
+        assert 0 <= result['peak_rss_growth_kb'] <= result['peak_rss_kb']
+
+
+def test_compact():
+    import pickle
+
+    r = CompactEntry(code='ab', amount=12)
+    assert not hasattr(r, '__dict__')
+    assert (r.code, r.amount, r.filler) == ('ab', 12, '')
+    assert r.to_dict() == {'code': 'ab', 'amount': 12}
+    assert r == {'code': 'ab', 'amount': 12}
+    assert r == CompactEntry.load(r.dump())
+    assert r.dump() == 'ab000012  '
+    assert CompactEntry.probe(r.dump()) == r
+    assert CompactEntry.probe('ab0000xx  ') is None
+
+    r.amount = 13
+    assert r.amount == 13
+    assert r != CompactEntry.load('ab000012  ')
+    with pytest.raises(TypeError):
+        r.filler = 'xx'
+    with pytest.raises(ValueError):
+        CompactEntry(code='ab', nope=1)
+
+    del r['code']
+    with pytest.raises(LookupError):
+        r.code
+    assert pickle.loads(pickle.dumps(r, 2)) == r
+
+
+def test_lazy():
+
+    class Record(bryl.LazyRecord):
+
+        code = bryl.Alphanumeric(length=2)
+
+        amount = bryl.Numeric(length=6)
+
+        date = bryl.Date('YYMMDD')
+
+        filler = bryl.Alphanumeric(length=2).reserved()
+
+    raw = 'ab000012140102xx'
+    r = Record.load(raw + '\n')
+    assert r._values == [bryl._pending] * 4
+    assert r.amount == 12
+    assert r._values[1] == 12
+    assert r._values.count(bryl._pending) == 3
+    assert 'code' in r and 'filler' not in r
+    assert r.dump() == 'ab000012140102  '
+    assert Record.load('ab000012140102  ').dump() == 'ab000012140102  '
+    assert r == Record(code='ab', amount=12, date=datetime.date(2014, 1, 2))
+
+    r.code = 'cd'
+    assert r.dump() == 'cd000012140102  '
+
+    # errors surface on access
+    bad = Record.load('ab0000x2140102  ')
+    assert bad.code == 'ab'
+    with pytest.raises(ValueError):
+        bad.amount
+    assert Record.probe('ab0000x2140102  ') is None
+    assert Record.probe(raw) == r.load(raw)
+
+
+def test_where(tmpdir):
+    records = entries(100)
+    path = tmpdir.join('lines')
+    path.write(''.join(r.dump() + '\n' for r in records))
+
+    def where(*predicates):
+        with open(str(path), 'rb') as fo:
+            return list(EntryLineReader(fo).where(*predicates))
+
+    assert where(Entry.code.eq('3')) == [r for r in records if r.code == '3']
+    assert (
+        where(Entry.code.isin(['1', '2']), ~Entry.amount.eq(1)) ==
+        [r for r in records if r.code in ('1', '2') and r.amount != 1]
+    )
+    assert (
+        where(Entry.amount.eq(5) | Entry.amount.eq(50)) ==
+        [records[5], records[50]]
+    )
+    assert where(Entry.code.startswith('6')) == records[6::7]
+    with pytest.raises(TypeError):
+        Entry.amount.startswith('0')
+    with pytest.raises(TypeError):
+        bryl.Numeric(length=2).eq(1)
+
+    with open(str(path), 'rb') as fo:
+        reader = EntryLineReader(fo).where(Entry.code.eq('0'))
+        assert list(reader.parallel(2, chunk_size=100)) == records[::7]
+
+    path = tmpdir.join('blocks')
+    path.write(''.join(r.dump() for r in records))
+    with open(str(path), 'rb') as fo:
+        reader = EntryBlockReader(fo, mapped=True).where(Entry.code.eq('0'))
+        assert list(reader) == records[::7]
+
+
+def test_index(tmpdir):
+    records = entries(100)
+    path = tmpdir.join('lines')
+    path.write(''.join(r.dump() + '\r\n' for r in records))
+
+    with open(str(path), 'rb') as fo:
+        reader = EntryLineReader(fo)
+        index = bryl.Index.build(
+            reader,
+            fields=[Entry.amount, Entry.code],
+            where=~Entry.code.eq('0'),
+        )
+        assert list(index.offsets) == range(0, 1000, 10)
+        index.save(str(tmpdir.join('lines.idx')))
+        index = bryl.Index.load(str(tmpdir.join('lines.idx')))
+        assert len(index.offsets) == 100
+
+        reader.index = index
+        reader.seek_record(42)
+        assert reader.next() == records[42]
+        assert reader.line_no == 44
+        assert reader.lookup(Entry.amount, 43) == [records[43]]
+        assert reader.lookup(Entry.amount, 42) == []
+        assert reader.lookup(Entry.code, '3') == records[3::7]
+        with pytest.raises(LookupError):
+            reader.lookup(CompactEntry.filler, '')
+
+    with open(str(path), 'rb') as fo:
+        reader = EntryLineReader(fo)
+        reader.index = index
+        assert list(reader.parallel(2, 256)) == records
+
+    path = tmpdir.join('blocks')
+    path.write(''.join(r.dump() for r in records))
+    with open(str(path), 'rb') as fo:
+        reader = EntryBlockReader(fo, mapped=True)
+        reader.seek_record(7)
+        assert reader.next() == records[7]
+        reader.index = bryl.Index.build(reader, fields=[Entry.amount])
+        assert reader.lookup(Entry.amount, 99) == [records[99]]
+        assert list(reader.index.offsets) == range(64, 800, 8)
+
+
+def test_dispatch(tmpdir):
+    records = [Header(name='hi')] + entries(20)
+    path = tmpdir.join('lines')
+    path.write(''.join(r.dump() + '\n' for r in records))
+    with open(str(path), 'rb') as fo:
+        reader = DispatchLineReader(fo)
+        assert reader.dispatch is DispatchLineReader.as_record_type
+        assert list(reader) == records
+    with open(str(path), 'rb') as fo:
+        assert list(DispatchLineReader(fo).parallel(2, 50)) == records
+
+    class StrictReader(bryl.LineReader):
+
+        record_type = bryl.Record
+
+        as_record_type = bryl.Dispatch(Entry.code, {'HH': Header, '1 ': Entry})
+
+    dispatch = bryl.Dispatch(Entry.amount, {12: Entry})
+    assert dispatch.record_types == {'000012': Entry}
+
+    with open(str(path), 'rb') as fo:
+        reader = StrictReader(fo)
+        assert reader.next() == records[0]
+        with pytest.raises(bryl.Malformed) as exc_info:
+            reader.next()
+        assert exc_info.value.offset == 2
+        assert 'discriminator "0 "' in str(exc_info.value)
+        assert reader.next() == records[2]
+        with pytest.raises(bryl.Malformed):
+            reader.next()
+
+
+def test_feed():
+    records = entries(50)
+    lines = ''.join(r.dump() + '\n' for r in records)
+    blocks = ''.join(r.dump() for r in records)
+
+    for reader, data in [
+            (EntryLineReader(None, include_terminal=True), lines),
+            (EntryBlockReader(None), blocks),
+        ]:
+        parsed = []
+        for i in xrange(0, len(data), 7):
+            parsed.extend(reader.feed(data[i:i + 7]))
+        parsed.extend(reader.feed('', eof=True))
+        if isinstance(reader, bryl.LineReader):
+            parsed = [record for record, terminal in parsed]
+        assert parsed == records
+        with pytest.raises(TypeError):
+            reader.feed('more')
+
+    # last line needs no terminal
+    reader = EntryLineReader(None)
+    assert list(reader.feed(records[0].dump())) == []
+    assert list(reader.feed('', eof=True)) == records[:1]
+
+    # errors are reported and streaming continues
+    reader = EntryBlockReader(None)
+    feed = reader.feed(blocks[:16] + 'x' * 8 + blocks[24:40])
+    assert [feed.next(), feed.next()] == records[:2]
+    with pytest.raises(bryl.Malformed) as exc_info:
+        feed.next()
+    assert exc_info.value.offset == 16
+    assert list(feed) == records[3:5]
+
+    writer = bryl.LineWriter(None, buffer_size=100)
+    chunks = list(writer.encode_all(records))
+    assert ''.join(chunks) == lines
+    assert len(chunks) == 5
+
+
+def test_chunked(tmpdir):
+    records = entries(50)
+    path = tmpdir.join('lines')
+    path.write('x\n' + ''.join(r.dump() + '\n' for r in records))
+
+    with open(str(path), 'rb') as fo:
+        fo.readline()
+        reader = EntryLineReader(fo, chunk_size=5)
+        assert reader.next() == records[0]
+        assert reader.next_record(CompactEntry, default=None) is None
+        assert reader.next_record() == records[1]
+        assert reader._tell() == 2 + 2 * 9
+        assert list(reader) == records[2:]
+        assert reader.line_no == 51
+
+    path = tmpdir.join('blocks')
+    blocks = ''.join(r.dump() for r in records)
+    path.write(blocks[:80] + 'x' * 8 + blocks[88:])
+    with open(str(path), 'rb') as fo:
+        reader = EntryBlockReader(fo, chunk_size=11)
+        assert [reader.next() for _ in xrange(10)] == records[:10]
+        with pytest.raises(bryl.Malformed) as exc_info:
+            reader.next_record()
+        assert exc_info.value.offset == 80
+        assert reader.next_block() == ('x' * 8, 80)
+        assert list(reader) == records[11:]
+        reader.seek_record(3)
+        assert reader.next() == records[3]
+        assert reader._tell() == 32
+
+
+def test_ctx():
+    version = bryl.ctx.version
+    assert bryl.ctx.effective['alpha_upper'] is False
+    with bryl.ctx.push(alpha_upper=True, alpha_filter=True):
+        assert bryl.ctx.alpha_upper is True
+        assert bryl.ctx.version > version
+        assert Entry(code='a\x00b').code == 'AB'
+        bryl.ctx(alpha_truncate=True)
+        assert bryl.ctx.effective['alpha_truncate'] is True
+        assert Entry(code='a\x00bcd').code == 'AB'
+    assert bryl.ctx.effective['alpha_truncate'] is False
+    assert bryl.ctx.version > version + 2
+    with pytest.raises(AttributeError):
+        bryl.ctx.nope
+    with pytest.raises(bryl.Field.error_type):
+        Entry(code='abc')
+
+
+def test_stats():
+    import pickle
+
+    records = entries(10)
+    data = ''.join(r.dump() for r in records) + 'x' * 8
+    reader = EntryBlockReader(None).feed(data, eof=True)
+    stats = bryl.Stats()
+    with stats.instrument(Entry, reader):
+        assert isinstance(vars(reader)['as_record_type'], type(test_stats))
+        state = vars(pickle.loads(pickle.dumps(reader)))
+        assert 'as_record_type' not in state
+        assert 'next_block' not in state
+        assert [reader.next() for _ in xrange(10)] == records
+        with pytest.raises(bryl.Malformed):
+            reader.next()
+        assert records[0].dump() == '0 000000'
+    assert reader.as_record_type is EntryBlockReader.as_record_type
+    assert 'next_block' not in vars(reader)
+    assert Entry._unpack_plan[0][3] == Entry.code._unpack
+    assert 'load' not in vars(Entry.amount)
+
+    metrics = stats.as_dict()
+    assert metrics['bytes_read'] == 88
+    assert metrics['EntryBlockReader.read.calls'] == 11
+    assert metrics['EntryBlockReader.as_record_type.calls'] == 11
+    assert metrics['EntryBlockReader.malformed.errors'] == 1
+    assert metrics['Entry.load.calls'] == 11
+    assert metrics['Entry.load.errors'] == 1
+    assert metrics['Entry.amount.unpack.calls'] == 11
+    assert metrics['Entry.amount.load.errors'] == 1
+    assert metrics['Entry.amount.validate.calls'] == 11
+    assert metrics['Entry.code.pack.calls'] == 1
+    assert metrics['Entry.dump.calls'] == 1
+    assert metrics['Entry.dump.seconds'] > 0
+
+    records[0].dump()
+    assert stats.as_dict()['Entry.dump.calls'] == 1
+
+    # inherited fields are shared but only subclass calls are counted
+    class SubEntry(Entry):
+
+        pass
+
+    assert SubEntry.code is Entry.code
+    stats = bryl.Stats()
+    with stats.instrument(SubEntry):
+        assert SubEntry.code is not Entry.code
+        assert Entry.load('a 000001') == Entry(code='a', amount=1)
+        assert Entry(code='b', amount=2).dump() == 'b 000002'
+        assert SubEntry.load('c 000003') == SubEntry(code='c', amount=3)
+    assert SubEntry.code is Entry.code
+    assert SubEntry.fields == Entry.fields
+    assert 'code' not in vars(SubEntry)
+    metrics = stats.as_dict()
+    assert metrics['SubEntry.load.calls'] == 1
+    assert metrics['SubEntry.code.unpack.calls'] == 1
+    assert metrics['SubEntry.code.validate.calls'] == 2
+    assert metrics['SubEntry.code.pack.calls'] == 0
+
+
+def test_matches():
+
+    class Footer(bryl.Record):
+
+        code = bryl.Alphanumeric(length=2).constant('FF')
+
+        count = bryl.Numeric(length=4)
+
+        filler = bryl.Alphanumeric(length=2).reserved()
+
+    assert Footer.filler._reserved and not Footer.code._reserved
+    assert Footer.layout.signature == ((0, 2, 'FF'),)
+
+    header, footer = Header(name='hi').dump(), Footer(count=3).dump()
+    assert Header.matches(header) and not Header.matches(footer)
+    assert Footer.matches('FF0003xx')
+    assert not Footer.matches('FF0003')
+    assert Footer.matches(buffer('..' + footer), 2)
+
+    types = [Header, Footer, Entry]
+    data = header + footer + Entry(code='a', amount=1).dump()
+    assert [
+        bryl.probe_many(types, data, offset) for offset in (0, 8, 16)
+    ] == types
+    assert bryl.probe_many([Header, Footer], 'xx') is None
+
+    assert Footer.probe(footer) == Footer(count=3)
+    assert Footer.probe('FF00x3  ') is None
+    assert Footer.count.probe(footer) == 3
+    assert Footer.count.probe('FF00x3  ') is None
+
+
+def test_splice():
+
+    class Record(bryl.Record):
+
+        keep_raw = True
+
+        code = bryl.Alphanumeric(length=2).constant('AB')
+
+        amount = bryl.Numeric(length=6)
+
+        date = bryl.Date('YYMMDD')
+
+        filler = bryl.Alphanumeric(length=2).reserved()
+
+    assert Record.layout.constants == ('AB', None, None, '  ')
+    assert Record(amount=1, date=datetime.date(2014, 1, 2)).dump() == (
+        'AB000001140102  '
+    )
+
+    # constants are always canonical
+    assert Record.load('AB000012140102xx').dump() == 'AB000012140102  '
+
+    raw = 'AB000012140102  '
+    r = Record.load(raw + '\n')
+    assert r.dump() == raw
+    assert r._raw is r.dump()
+
+    r.amount = 13
+    assert r._dirty == frozenset(['amount'])
+    assert r.dump() == 'AB000013140102  '
+    r['date'] = datetime.date(2015, 1, 2)
+    assert r.dump() == 'AB000013150102  '
+    del r['amount']
+    with pytest.raises(LookupError):
+        r.dump()
+
+    r = Record.load(raw)
+    r.update(amount=14)
+    assert r._raw is None
+    assert r.dump() == 'AB000014140102  '
+
+    r = Record.load(buffer(raw))
+    assert type(r._raw) is buffer
+    assert r.dump() == raw
+    assert type(r._raw) is str
+    assert Record.load(raw) == r
+
+    # not a field
+    r = Record.load(raw)
+    r['extra'] = 1
+    assert r.dump() == raw
+
+    # off by default
+    class Plain(bryl.Record):
+
+        amount = bryl.Numeric(length=6)
+
+    r = Plain.load('000012')
+    assert r._raw is None and r.dump() == '000012'
+
+
+def test_validate_reader(tmpdir):
+    records = entries(10)
+    lines = [r.dump() + '\n' for r in records]
+    lines[2] = 'a 0000x1\n'
+    lines[5] = 'HHhello \n'
+    lines[7] = 'a\n'
+    path = tmpdir.join('lines')
+    path.write(''.join(lines))
+
+    with open(str(path), 'rb') as fo:
+        reader = DispatchLineReader(fo, chunk_size=16)
+        valid = list(reader.validate())
+        assert valid == (
+            records[:2] + records[3:5] + [Header(name='hello')] +
+            records[6:7] + records[8:]
+        )
+        assert [
+            (e.line_no, e.offset, e.field) for e in reader.errors
+        ] == [(3, 20, 'amount'), (8, 65, 'amount')]
+        assert 'invalid literal' in reader.errors[0].reason
+
+    reader = EntryBlockReader(None).feed('x' * 16 + records[0].dump(), eof=True)
+    assert list(reader.validate(max_errors=1)) == []
+    assert [(e.offset, e.field) for e in reader.errors] == [(2, 'amount')]
+    assert list(reader.validate()) == [records[0]]
+    assert len(reader.errors) == 2
+
+
+def test_batch():
+    records = [Header(name='hi')] + entries(3) + [Header(name='bye')]
+    records.append(CompactEntry(code='x', amount=1))
+    data = bryl.dump_batch(records)
+    assert data.count('tests.Header') == 2
+    types = [Entry, Header, CompactEntry]
+    assert bryl.load_batch(data, types) == records
+    assert bryl.load_batch(buffer(data), types) == records
+    assert bryl.load_batch(bryl.dump_batch([]), types) == []
+
+    with pytest.raises(ValueError) as exc_info:
+        bryl.load_batch(data, [Entry])
+    assert 'Unexpected record type "tests.Header"' in str(exc_info.value)
+    with pytest.raises(ValueError):
+        bryl.load_batch('nope', types)
+
+    # same named record types must be tagged apart
+    def record_type(length):
+
+        class Generated(bryl.Record):
+
+            code = bryl.Alphanumeric(length=length)
+
+        return Generated
+
+    a, b = record_type(2), record_type(3)
+    with pytest.raises(ValueError) as exc_info:
+        bryl.dump_batch([a(code='a'), b(code='b')])
+    assert 'same batch tag "tests.Generated"' in str(exc_info.value)
+    with pytest.raises(ValueError):
+        bryl.load_batch(bryl.dump_batch([b(code='b')]), [a, b])
+    b.batch_tag = 'tests.Generated3'
+    records = [a(code='a'), b(code='b'), a(code='c')]
+    assert bryl.load_batch(bryl.dump_batch(records), [a, b]) == records
+
+
+def test_layout():
+    layout = Header.layout
+    assert layout.names == ('code', 'name')
+    assert layout.offsets == (0, 2)
+    assert layout.lengths == (2, 6)
+    assert layout.pads == (' ', ' ')
+    assert layout.length == Header.length == 8
+    assert layout.slices == (('code', 0, 2), ('name', 2, 8))
+    assert layout.constants == ('HH', None)
+    assert layout.discriminator == (0, 2)
+    assert Entry.layout.discriminator is None
+    with pytest.raises(AttributeError):
+        layout.length = 10
+
+    class Base(bryl.Record):
+
+        code = bryl.Alphanumeric(length=2)
+
+        amount = bryl.Numeric(length=6)
+
+    class Appended(Base):
+
+        note = bryl.Alphanumeric(length=4)
+
+    class Overridden(Base):
+
+        code = bryl.Alphanumeric(length=4)
+
+    assert Appended.layout.names == ('code', 'amount', 'note')
+    assert Appended.fields[0] is Base.fields[0]
+    assert Overridden.layout.names == ('code', 'amount')
+    assert Overridden.layout.offsets == (0, 4)
+    assert Overridden.fields[1] is not Base.amount
+    assert Base.amount.offset == 2
+
+    class Footer(bryl.Record):
+
+        code = bryl.Alphanumeric(length=2).constant('FF')
+
+        count = bryl.Numeric(length=6)
+
+    dispatch = bryl.Dispatch.from_types([Header, Footer], default=Entry)
+    assert dispatch.lookup('FF000001') is Footer
+    assert dispatch.lookup('xx000001') is Entry
+    with pytest.raises(TypeError):
+        bryl.Dispatch.from_types([Header, Entry])
+    with pytest.raises(TypeError):
+        bryl.Dispatch.from_types([Header, Header])
+
+    writer = bryl.BlockWriter(None)
+    assert ''.join(writer.encode_all([Footer(count=1)])) == 'FF000001'
+
+    class Reader(bryl.BlockReader):
+
+        record_type = Entry
+
+    assert Reader(None, as_record_type=Entry).record_size == 8